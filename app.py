@@ -1,598 +1,939 @@
-import streamlit as st
-from streamlit_gsheets import GSheetsConnection
-import pandas as pd
-from datetime import datetime
-import hashlib
-import numpy as np
-
-# --- PAGE CONFIG ---
-st.set_page_config(page_title="UNAM DECE Projects Portal", layout="wide")
-
-# --- LOGO ---
-try:
-    st.sidebar.image("Logo_UNAM_Namibia.png", use_container_width=True)
-except:
-    st.sidebar.write("### UNAM JEDS")
-
-st.title("School of Engineering and the Built Environment")
-st.subheader("DECE PROJECTS PORTAL")
-
-# --- CONNECTION ---
-conn = st.connection("gsheets", type=GSheetsConnection)
-
-# --- HELPERS ---
-def clean_id(val):
-    if pd.isna(val) or val == "": return ""
-    return str(val).split('.')[0].strip()
-
-def hash_password(password):
-    return hashlib.sha256(str.encode(password)).hexdigest()
-
-def load_data(sheet_name):
-    try:
-        df = conn.read(worksheet=sheet_name, ttl=0)
-        if not df.empty and 'student_id' in df.columns:
-            df['student_id'] = df['student_id'].astype(str).apply(clean_id)
-        return df
-    except:
-        return pd.DataFrame()
-
-# --- OPTIONS FOR SELECT SLIDER ---
-mark_options = [float(x) for x in np.arange(0, 10.5, 0.5)]
-
-# --- AUTHENTICATION STATE ---
-if 'logged_in' not in st.session_state:
-    st.session_state['logged_in'] = False
-    st.session_state['user_name'] = ""
-    st.session_state['user_email'] = ""
-
-# --- SIDEBAR NAVIGATION ---
-st.sidebar.header("Navigation")
-# Added "Resources" to the Menu
-role = st.sidebar.radio("Management Menu", ["Registration", "Panelist / Examiner", "Coordinator", "Project Suggestions", "Resources"])
-project_type = st.sidebar.radio("Select Stream", ["Research Project", "Design Project"])
-
-# --- ROLE: REGISTRATION ---
-if role == "Registration":
-    reg_tab, view_tab, scores_tab = st.tabs(["New Registration", "Check My Registration", "📊 View My Scores"])
-    
-    with reg_tab:
-        if project_type == "Research Project":
-            st.header("📝 Student Research Registration")
-            with st.form("reg_form", clear_on_submit=True):
-                n = st.text_input("Full Name")
-                i = st.text_input("Student ID")
-                e = st.text_input("Email")
-                s = st.text_input("Supervisor")
-                t = st.text_area("Research Title")
-                abst = st.text_area("Research Abstract (Max 250 words)")
-                
-                if st.form_submit_button("Submit Registration"):
-                    sd = load_data("students")
-                    ci = clean_id(i)
-                    word_count = len(abst.split())
-                    if not all([n, ci, e, s, t, abst]): st.error("Please fill in all fields.")
-                    elif word_count > 250: st.error(f"Abstract too long ({word_count} words).")
-                    else:
-                        nr = pd.DataFrame([{"student_id":ci,"student_name":n,"email":e,"supervisor":s,"research_title":t, "abstract": abst}])
-                        conn.update(worksheet="students", data=pd.concat([sd, nr], ignore_index=True))
-                        st.success("Research Registered!")
-        else:
-            st.header("👥 Design Project Group Registration")
-            with st.form("design_reg_form", clear_on_submit=True):
-                g_name = st.text_input("Group Name / Project Title")
-                superv = st.text_input("Supervisor")
-                g_abst = st.text_area("Project Abstract (Max 250 words)")
-                st.write("--- Group Members (Min 2) ---")
-                m1_n = st.text_input("M1 Name"); m1_id = st.text_input("M1 ID")
-                m2_n = st.text_input("M2 Name"); m2_id = st.text_input("M2 ID")
-                m3_n = st.text_input("M3 Name"); m3_id = st.text_input("M3 ID")
-                m4_n = st.text_input("M4 Name (Optional)"); m4_id = st.text_input("M4 ID (Optional)")
-                if st.form_submit_button("Submit Group Registration"):
-                    word_count = len(g_abst.split())
-                    if not all([g_name, superv, g_abst, m1_n, m1_id, m2_n, m2_id]):
-                        st.error("Please fill in all fields, if no supervisor type TBA. Also make sure atleast 2 people per group!")
-                    elif word_count > 250: st.error(f"Abstract too long ({word_count} words).")
-                    else:
-                        dg = load_data("design_groups")
-                        new_mems = []
-                        for name, sid in [(m1_n, m1_id), (m2_n, m2_id), (m3_n, m3_id), (m4_n, m4_id)]:
-                            if name and sid:
-                                new_mems.append({"group_name": g_name, "student_name": name, "student_id": clean_id(sid), "supervisor": superv, "abstract": g_abst})
-                        conn.update(worksheet="design_groups", data=pd.concat([dg, pd.DataFrame(new_mems)], ignore_index=True))
-                        st.success("Design Group Registered!")
-
-    with view_tab:
-        st.header("🔍 View Registration Details")
-        if project_type == "Research Project":
-            search_id = st.text_input("Enter Student ID to find your details")
-            if search_id:
-                sd = load_data("students")
-                ci = clean_id(search_id)
-                match = sd[sd['student_id'] == ci]
-                if not match.empty:
-                    st.write("### Your Registration Information")
-                    # Using st.dataframe with column_config for better resizing
-                    st.dataframe(
-                        match,
-                        column_config={
-                            "student_id": st.column_config.TextColumn("Student ID", width="small"),
-                            "student_name": st.column_config.TextColumn("Full Name", width="medium"),
-                            "email": st.column_config.TextColumn("Email", width="medium"),
-                            "supervisor": st.column_config.TextColumn("Supervisor", width="medium"),
-                            "research_title": st.column_config.TextColumn("Research Title", width="large"),
-                            "abstract": st.column_config.TextColumn("Abstract", width="large"),
-                        },
-                        hide_index=True,
-                        use_container_width=True
-                    )
-                else: 
-                    st.warning("No registration found for this ID.")
-        else:
-            search_group = st.text_input("Enter your student ID to find group details")
-            if search_group:
-                dg = load_data("design_groups")
-                match = dg[dg['student_id'].str.contains(search_group, case=False, na=False)]
-                if not match.empty:
-                    st.write("### Group Registration Information")
-                    st.dataframe(
-                        match,
-                        column_config={
-                            "group_name": st.column_config.TextColumn("Group Name", width="large"),
-                            "student_name": st.column_config.TextColumn("Member Name", width="medium"),
-                            "student_id": st.column_config.TextColumn("Student ID", width="small"),
-                            "supervisor": st.column_config.TextColumn("Supervisor", width="medium"),
-                            "abstract": st.column_config.TextColumn("Abstract", width="large"),
-                        },
-                        hide_index=True,
-                        use_container_width=True
-                    )
-                else: 
-                    st.warning("No registration found for this student ID.")
-
-    with scores_tab:
-        st.header("📊 My Assessment Scores & Feedback")
-        st.info("Enter your Student ID (or Group ID for Design Projects) to view your scores and examiner comments.")
-
-        if project_type == "Research Project":
-            search_scores_id = st.text_input("Enter your Student ID", key="scores_search_id")
-            if search_scores_id:
-                ci = clean_id(search_scores_id)
-                sd = load_data("students")
-                student_match = sd[sd['student_id'] == ci]
-                if student_match.empty:
-                    st.warning("No student registration found for this ID.")
-                else:
-                    st.success(f"👤 Student: **{student_match.iloc[0]['student_name']}** | Supervisor: {student_match.iloc[0]['supervisor']}")
-                    m_df = load_data("marks")
-                    student_marks = m_df[m_df['student_id'] == ci] if not m_df.empty else pd.DataFrame()
-
-                    if student_marks.empty:
-                        st.info("No scores recorded yet. Check back after your presentations.")
-                    else:
-                        stage_order = ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Research Report (60%)"]
-                        stage_max =   {"Presentation 1 (10%)": 50, "Presentation 2 (10%)": 20, "Presentation 3 (20%)": 30, "Final Research Report (60%)": 100}
-                        stage_weight = {"Presentation 1 (10%)": 10, "Presentation 2 (10%)": 10, "Presentation 3 (20%)": 20, "Final Research Report (60%)": 60}
-                        crit_labels = {
-                            "Presentation 1 (10%)": ["Problem Statement", "Literature Review", "Methodology", "Project Planning", "Technical Communication"],
-                            "Presentation 2 (10%)": ["Progress", "Technical Communication", "", "", ""],
-                            "Presentation 3 (20%)": ["Data Collection", "Data Analysis & Interpretation", "Technical Communication", "", ""],
-                            "Final Research Report (60%)": ["", "", "", "", ""],
-                        }
-
-                        total_weighted = 0.0
-                        total_weight_so_far = 0
-                        for stage in stage_order:
-                            stage_rows = student_marks[student_marks['assessment_type'] == stage]
-                            if stage_rows.empty:
-                                continue
-                            avg_raw = stage_rows['raw_mark'].mean()
-                            max_mark = stage_max[stage]
-                            pct = round((avg_raw / max_mark) * 100, 1)
-                            weighted_contrib = round((avg_raw / max_mark) * stage_weight[stage], 2)
-                            total_weighted += weighted_contrib
-                            total_weight_so_far += stage_weight[stage]
-
-                            with st.expander(f"**{stage}** — {avg_raw:.1f} / {max_mark}  ({pct}%)", expanded=True):
-                                num_examiners = len(stage_rows)
-                                st.caption(f"Averaged from {num_examiners} examiner(s)")
-
-                                # Criteria breakdown
-                                labels = crit_labels.get(stage, [])
-                                crit_cols = ['crit_1', 'crit_2', 'crit_3', 'crit_4', 'crit_5']
-                                crit_data = []
-                                for i, col in enumerate(crit_cols):
-                                    label = labels[i] if i < len(labels) and labels[i] else ""
-                                    if label and col in stage_rows.columns:
-                                        avg_crit = stage_rows[col].mean()
-                                        crit_data.append({"Criterion": label, "Avg Score": f"{avg_crit:.1f} / 10"})
-                                if crit_data:
-                                    st.write("**Criteria Breakdown:**")
-                                    st.dataframe(pd.DataFrame(crit_data), hide_index=True, use_container_width=True)
-
-                                # Examiner remarks
-                                remarks_list = stage_rows[stage_rows['remarks'].notna() & (stage_rows['remarks'].str.strip() != "")]
-                                if not remarks_list.empty:
-                                    st.write("**💬 Examiner Remarks:**")
-                                    for _, row in remarks_list.iterrows():
-                                        st.markdown(f"> *\"{row['remarks']}\"*")
-                                else:
-                                    st.caption("No remarks provided for this stage.")
-
-                        # Overall grade summary
-                        st.divider()
-                        st.subheader("🏆 Grade Summary")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Weighted Score So Far", f"{total_weighted:.1f} / {total_weight_so_far}")
-                        with col2:
-                            if total_weight_so_far == 100:
-                                grade_pct = total_weighted
-                                letter = "A+" if grade_pct >= 90 else "A" if grade_pct >= 80 else "B" if grade_pct >= 70 else "C" if grade_pct >= 60 else "D" if grade_pct >= 50 else "F"
-                                st.metric("Final Grade", f"{grade_pct:.1f}%", delta=letter)
-                            else:
-                                remaining = 100 - total_weight_so_far
-                                st.metric("Assessments Remaining", f"{remaining}% weight outstanding")
-
-        else:  # Design Project
-            search_group_id = st.text_input("Enter your Student ID to find your group scores", key="scores_group_search")
-            if search_group_id:
-                dg = load_data("design_groups")
-                member_match = dg[dg['student_id'].str.contains(clean_id(search_group_id), case=False, na=False)]
-                if member_match.empty:
-                    st.warning("No design group found for this Student ID.")
-                else:
-                    group_name = member_match.iloc[0]['group_name']
-                    st.success(f"👥 Group: **{group_name}** | Supervisor: {member_match.iloc[0]['supervisor']}")
-                    dm_df = load_data("design_marks")
-                    group_marks = dm_df[dm_df['group_name'] == group_name] if not dm_df.empty else pd.DataFrame()
-
-                    if group_marks.empty:
-                        st.info("No scores recorded yet. Check back after your presentations.")
-                    else:
-                        stage_order = ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Design Report (60%)"]
-                        stage_max =   {"Presentation 1 (10%)": 30, "Presentation 2 (10%)": 30, "Presentation 3 (20%)": 30, "Final Design Report (60%)": 100}
-                        stage_weight = {"Presentation 1 (10%)": 10, "Presentation 2 (10%)": 10, "Presentation 3 (20%)": 20, "Final Design Report (60%)": 60}
-                        crit_labels = {
-                            "Presentation 1 (10%)": ["Problem Statement & Justification", "Comparison Matrix", "Materials & Methods", "", ""],
-                            "Presentation 2 (10%)": ["Sustainability Analysis", "Technical Comms", "Q&A Defense", "", ""],
-                            "Presentation 3 (20%)": ["Design Approaches", "Synthesis & Results", "Prototype Functionality", "", ""],
-                            "Final Design Report (60%)": ["", "", "", "", ""],
-                        }
-
-                        total_weighted = 0.0
-                        total_weight_so_far = 0
-                        for stage in stage_order:
-                            stage_rows = group_marks[group_marks['assessment_type'] == stage]
-                            if stage_rows.empty:
-                                continue
-                            avg_raw = stage_rows['raw_mark'].mean()
-                            max_mark = stage_max[stage]
-                            pct = round((avg_raw / max_mark) * 100, 1)
-                            weighted_contrib = round((avg_raw / max_mark) * stage_weight[stage], 2)
-                            total_weighted += weighted_contrib
-                            total_weight_so_far += stage_weight[stage]
-
-                            with st.expander(f"**{stage}** — {avg_raw:.1f} / {max_mark}  ({pct}%)", expanded=True):
-                                num_examiners = len(stage_rows)
-                                st.caption(f"Averaged from {num_examiners} examiner(s)")
-
-                                labels = crit_labels.get(stage, [])
-                                crit_cols = ['crit_1', 'crit_2', 'crit_3', 'crit_4', 'crit_5']
-                                crit_data = []
-                                for i, col in enumerate(crit_cols):
-                                    label = labels[i] if i < len(labels) and labels[i] else ""
-                                    if label and col in stage_rows.columns:
-                                        avg_crit = stage_rows[col].mean()
-                                        crit_data.append({"Criterion": label, "Avg Score": f"{avg_crit:.1f} / 10"})
-                                if crit_data:
-                                    st.write("**Criteria Breakdown:**")
-                                    st.dataframe(pd.DataFrame(crit_data), hide_index=True, use_container_width=True)
-
-                                remarks_list = group_marks[(group_marks['assessment_type'] == stage) & group_marks['remarks'].notna() & (group_marks['remarks'].str.strip() != "")]
-                                if not remarks_list.empty:
-                                    st.write("**💬 Examiner Remarks:**")
-                                    for _, row in remarks_list.iterrows():
-                                        st.markdown(f"> *\"{row['remarks']}\"*")
-                                else:
-                                    st.caption("No remarks provided for this stage.")
-
-                        st.divider()
-                        st.subheader("🏆 Grade Summary")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Weighted Score So Far", f"{total_weighted:.1f} / {total_weight_so_far}")
-                        with col2:
-                            if total_weight_so_far == 100:
-                                grade_pct = total_weighted
-                                letter = "A+" if grade_pct >= 90 else "A" if grade_pct >= 80 else "B" if grade_pct >= 70 else "C" if grade_pct >= 60 else "D" if grade_pct >= 50 else "F"
-                                st.metric("Final Grade", f"{grade_pct:.1f}%", delta=letter)
-                            else:
-                                remaining = 100 - total_weight_so_far
-                                st.metric("Assessments Remaining", f"{remaining}% weight outstanding")
-
-# --- ROLE: PANELIST / EXAMINER ---
-elif role == "Panelist / Examiner":
-    st.header(f"🧑‍🏫 Examiner Portal ({project_type})")
-    if not st.session_state['logged_in']:
-        tab1, tab2 = st.tabs(["Login", "Create Account"])
-        with tab1:
-            with st.form("login_form"):
-                l_user, l_pw = st.text_input("Username"), st.text_input("Password", type="password")
-                if st.form_submit_button("Login"):
-                    u_df = load_data("users")
-                    match = u_df[(u_df['username'] == l_user) & (u_df['password'] == hash_password(l_pw))]
-                    if not match.empty:
-                        st.session_state['logged_in'] = True
-                        st.session_state['user_name'] = match.iloc[0]['full_name']
-                        st.session_state['user_email'] = match.iloc[0].get('email', "")
-                        st.rerun()
-                    else: st.error("Invalid credentials.")
-        with tab2:
-            with st.form("create_acc"):
-                reg_full, reg_user, reg_pw, reg_email, auth_key = st.text_input("Full Name"), st.text_input("Username"), st.text_input("Password", type="password"), st.text_input("Email"), st.text_input("Department Key", type="password")
-                if st.form_submit_button("Create Account"):
-                    if auth_key == "JEDSECE2026":
-                        u_df = load_data("users")
-                        new_u = pd.DataFrame([{"full_name": reg_full, "username": reg_user, "password": hash_password(reg_pw), "email": reg_email}])
-                        conn.update(worksheet="users", data=pd.concat([u_df, new_u], ignore_index=True))
-                        st.success("Account created!")
-                    else: st.error("Invalid Key.")
-    else:
-        st.sidebar.info(f"Signed in: {st.session_state['user_name']}")
-        if st.sidebar.button("Sign Out"): st.session_state['logged_in'] = False; st.rerun()
-        
-        assess_tab, history_tab, suggest_tab = st.tabs(["Assess Students", "📋 My Score History", "Suggest New Projects"])
-        
-        with assess_tab:
-            ws = "design_marks" if project_type == "Design Project" else "marks"
-            m_df = load_data(ws)
-            if project_type == "Research Project":
-                s_df = load_data("students")
-                id_list = [""] + sorted(s_df['student_id'].unique().tolist()) if not s_df.empty else [""]
-                name_list = [""] + sorted(s_df['student_name'].unique().tolist()) if not s_df.empty else [""]
-                if 'sel_id' not in st.session_state: st.session_state.sel_id = ""
-                if 'sel_name' not in st.session_state: st.session_state.sel_name = ""
-                def update_by_id(): st.session_state.sel_name = s_df[s_df['student_id'] == st.session_state.sel_id]['student_name'].iloc[0] if st.session_state.sel_id else ""
-                def update_by_name(): st.session_state.sel_id = s_df[s_df['student_name'] == st.session_state.sel_name]['student_id'].iloc[0] if st.session_state.sel_name else ""
-                col1, col2 = st.columns(2)
-                with col1: target_id = st.selectbox("Select Student ID", options=id_list, key="sel_id", on_change=update_by_id)
-                with col2: target_name = st.selectbox("Select Student Name", options=name_list, key="sel_name", on_change=update_by_name)
-                if target_id and not s_df.empty:
-                    student_info = s_df[s_df['student_id'] == target_id]
-                    if not student_info.empty and 'research_title' in student_info.columns:
-                        st.info(f"📄 **Research Title:** {student_info.iloc[0]['research_title']}")
-                f_stage = st.selectbox("Assessment Stage", ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Research Report (60%)"])
-            else:
-                g_df = load_data("design_groups")
-                target_id = st.selectbox("Select Design Group", options=[""] + sorted(g_df['group_name'].unique().tolist()) if not g_df.empty else [""])
-                if target_id and not g_df.empty:
-                    group_info = g_df[g_df['group_name'] == target_id]
-                    if not group_info.empty:
-                        supervisor = group_info.iloc[0].get('supervisor', 'N/A')
-                        st.info(f"🏗️ **Project Title:** {target_id}  |  **Supervisor:** {supervisor}")
-                f_stage = st.selectbox("Assessment Stage", ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Design Report (60%)"])
-
-            with st.form("score_form", clear_on_submit=True):
-                st.write(f"**Target ID:** {target_id}")
-                m_c1 = m_c2 = m_c3 = m_c4 = m_c5 = 0.0 # Criteria initialization
-                
-                if "Report" in f_stage:
-                    st.subheader("📝 Final Report Mark")
-                    raw_mark = st.number_input("Mark (0-100)", 0.0, 100.0, step=0.5)
-                elif project_type == "Research Project":
-                    if "Presentation 1" in f_stage:
-                        st.subheader("🏗️ Proposal Assessment (Out of 50)")
-                        m_c1 = st.select_slider("1. Problem statement (LO 1, 2, ECN 4)", options=mark_options)
-                        st.caption("Guidelines: Problem clearly defined (WHAT/WHERE/WHEN/HOW/WHY), scope, significance.")
-                        m_c2 = st.select_slider("2. Literature Review (LO 6)", options=mark_options)
-                        st.caption("Guidelines: Cite/reference ability, critique related work, identify gaps.")
-                        m_c3 = st.select_slider("3. Methodology (LO 2, 3, ECN 5)", options=mark_options)
-                        st.caption("Guidelines: Identify approaches, valid design, specify ICT tools.")
-                        m_c4 = st.select_slider("4. Project Planning (LO 1)", options=mark_options)
-                        st.caption("Guidelines: Plan with valid milestones and resources.")
-                        m_c5 = st.select_slider("5. Technical Communication (LO 5, ECN 6)", options=mark_options)
-                        st.caption("Guidelines: Presentation, terminology, illustrations, Q&A defense.")
-                        raw_mark = float(m_c1 + m_c2 + m_c3 + m_c4 + m_c5)
-                    elif "Presentation 2" in f_stage:
-                        st.subheader("📊 Progress Assessment (Out of 20)")
-                        m_c1 = st.select_slider("1. Progress (LO 1, 2, 4, ECN 4)", options=mark_options)
-                        st.caption("Guidelines: Adherence to method, setup, analysis, milestones.")
-                        m_c2 = st.select_slider("2. Technical Communication (LO 5, ECN 6)", options=mark_options)
-                        st.caption("Guidelines: Graphs/flowcharts, terminology, Q&A.")
-                        raw_mark = float(m_c1 + m_c2)
-                    else: 
-                        st.subheader("🏁 Final Presentation Assessment (Out of 30)")
-                        m_c1 = st.select_slider("1. Data Collection (LO 1, 2, 3, ECN 4, 5)", options=mark_options)
-                        st.caption("Guidelines: Valid data collection, appropriate tools, effective display.")
-                        m_c2 = st.select_slider("2. Data analysis and interpretation (LO 1, 2, 3, ECN 4, 5)", options=mark_options)
-                        st.caption("Guidelines: ICT tools, results vs objectives, valid conclusions.")
-                        m_c3 = st.select_slider("3. Technical Communication (LO 5, ECN 6)", options=mark_options)
-                        st.caption("Guidelines: Presentation of findings, defense of research.")
-                        raw_mark = float(m_c1 + m_c2 + m_c3)
-                else: # DESIGN STREAM
-                    if "Presentation 1" in f_stage:
-                        st.subheader("🏗️ Design Proposal (Out of 30)")
-                        m_c1 = st.select_slider("Problem Statement & Justification", options=mark_options)
-                        st.caption("Guidelines: Identification of engineering problem and scope.")
-                        m_c2 = st.select_slider("Comparison Matrix", options=mark_options)
-                        st.caption("Guidelines: Selection of optimal solution based on metrics.")
-                        m_c3 = st.select_slider("Materials & Methods", options=mark_options)
-                        st.caption("Guidelines: Component suitability and design methodology.")
-                    elif "Presentation 2" in f_stage:
-                        st.subheader("📊 Progress Presentation (Out of 30)")
-                        m_c1 = st.select_slider("Sustainability Analysis (LO 1, 2, 4)", options=mark_options)
-                        st.caption("Guidelines: Environmental and social impact considerations.")
-                        m_c2 = st.select_slider("Technical Comms (LO 5)", options=mark_options)
-                        st.caption("Guidelines: Quality of diagrams, schematics, and flow.")
-                        m_c3 = st.select_slider("Q&A Defense", options=mark_options)
-                        st.caption("Guidelines: Addressing technical queries about the design.")
-                    else: 
-                        st.subheader("🏁 Final Presentation (Out of 30)")
-                        m_c1 = st.select_slider("Design Approaches (LO 4, 7)", options=mark_options)
-                        st.caption("Guidelines: Engineering standards and design synthesis.")
-                        m_c2 = st.select_slider("Synthesis & Results (LO 1, 4)", options=mark_options)
-                        st.caption("Guidelines: Validation through testing and data.")
-                        m_c3 = st.select_slider("Prototype Functionality (LO 7)", options=mark_options)
-                        st.caption("Guidelines: Demonstration of prototype/built design.")
-                    raw_mark = float(m_c1 + m_c2 + m_c3)
-
-                remarks = st.text_area("Remarks")
-                initials = st.text_input("Initials (Required)")
-                if st.form_submit_button("Submit Marks"):
-                    if not target_id or not initials.strip(): st.error("Fill required fields.")
-                    else:
-                        id_col = "student_id" if project_type == "Research Project" else "group_name"
-                        new_row = pd.DataFrame([{id_col: target_id, "assessment_type": f_stage, "raw_mark": raw_mark, 
-                                                 "crit_1": m_c1, "crit_2": m_c2, "crit_3": m_c3, "crit_4": m_c4, "crit_5": m_c5, # Mapping criteria
-                                                 "examiner": f"{st.session_state['user_name']} ({initials.upper()})", 
-                                                 "remarks": remarks, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")}])
-                        conn.update(worksheet=ws, data=pd.concat([m_df, new_row], ignore_index=True))
-                        st.success("Marks & Individual Criteria saved successfully!")
-
-        with history_tab:
-            st.subheader(f"📋 My Submitted Scores — {project_type}")
-            ws_h = "design_marks" if project_type == "Design Project" else "marks"
-            h_df = load_data(ws_h)
-            examiner_name = st.session_state['user_name']
-
-            if h_df.empty:
-                st.info("No scores have been submitted yet.")
-            else:
-                # Filter rows submitted by this examiner (name is stored as "Full Name (INITIALS)")
-                my_rows = h_df[h_df['examiner'].str.contains(examiner_name, case=False, na=False)] if 'examiner' in h_df.columns else pd.DataFrame()
-                if my_rows.empty:
-                    st.info("You have not submitted any scores yet for this stream.")
-                else:
-                    id_col = "student_id" if project_type == "Research Project" else "group_name"
-                    id_label = "Student ID" if project_type == "Research Project" else "Group Name"
-
-                    # Summary metrics
-                    total_submissions = len(my_rows)
-                    unique_students = my_rows[id_col].nunique() if id_col in my_rows.columns else 0
-                    stages_covered = my_rows['assessment_type'].nunique() if 'assessment_type' in my_rows.columns else 0
-                    c1, c2, c3 = st.columns(3)
-                    c1.metric("Total Submissions", total_submissions)
-                    c2.metric(f"Unique {id_label}s Assessed", unique_students)
-                    c3.metric("Assessment Stages Covered", stages_covered)
-
-                    st.divider()
-
-                    # Filter controls
-                    all_stages = sorted(my_rows['assessment_type'].dropna().unique().tolist()) if 'assessment_type' in my_rows.columns else []
-                    filter_stage = st.selectbox("Filter by Stage", ["All Stages"] + all_stages)
-                    filtered = my_rows if filter_stage == "All Stages" else my_rows[my_rows['assessment_type'] == filter_stage]
-
-                    # Display grouped by stage
-                    for stage in (all_stages if filter_stage == "All Stages" else [filter_stage]):
-                        stage_rows = filtered[filtered['assessment_type'] == stage]
-                        if stage_rows.empty:
-                            continue
-                        with st.expander(f"**{stage}** — {len(stage_rows)} submission(s)", expanded=True):
-                            display_cols = [id_col, 'raw_mark', 'crit_1', 'crit_2', 'crit_3', 'crit_4', 'crit_5', 'remarks', 'timestamp']
-                            display_cols = [c for c in display_cols if c in stage_rows.columns]
-                            rename_map = {
-                                id_col: id_label, 'raw_mark': 'Total Mark',
-                                'crit_1': 'C1', 'crit_2': 'C2', 'crit_3': 'C3', 'crit_4': 'C4', 'crit_5': 'C5',
-                                'remarks': 'Remarks', 'timestamp': 'Submitted At'
-                            }
-                            st.dataframe(
-                                stage_rows[display_cols].rename(columns=rename_map),
-                                hide_index=True,
-                                use_container_width=True,
-                                column_config={
-                                    id_label: st.column_config.TextColumn(id_label, width="small"),
-                                    "Total Mark": st.column_config.NumberColumn("Total Mark", format="%.1f"),
-                                    "Remarks": st.column_config.TextColumn("Remarks", width="large"),
-                                    "Submitted At": st.column_config.TextColumn("Submitted At", width="medium"),
-                                }
-                            )
-
-        with suggest_tab:
-            st.subheader("💡 Suggest a New Project")
-            with st.form("new_suggest_form", clear_on_submit=True):
-                s_type = st.radio("Category", ["Research Project", "Design Project"])
-                s_title = st.text_input("Title")
-                s_abstract = st.text_area("Abstract")
-                if st.form_submit_button("Post"):
-                    ps_df = load_data("project_suggestions")
-                    new_s = pd.DataFrame([{"type": s_type, "title": s_title, "abstract": s_abstract, 
-                                           "supervisor": st.session_state['user_name'], "email": st.session_state['user_email']}])
-                    conn.update(worksheet="project_suggestions", data=pd.concat([ps_df, new_s], ignore_index=True))
-                    st.success("Posted!")
-
-# --- ROLE: COORDINATOR ---
-elif role == "Coordinator":
-    st.header("🔑 Coordinator Dashboard")
-    pwd = st.sidebar.text_input("Password", type="password")
-    if (project_type == "Research Project" and pwd == "Blackberry") or (project_type == "Design Project" and pwd == "Apple"):
-        grade_tab, manage_tab = st.tabs(["View Grades", "Manage Resources"])
-        
-        with grade_tab:
-            ws, target_col = ("marks", "student_id") if project_type == "Research Project" else ("design_marks", "group_name")
-            md = load_data(ws); base_df = load_data("students" if project_type == "Research Project" else "design_groups")
-            if not base_df.empty and not md.empty:
-                piv = md.pivot_table(index=target_col, columns='assessment_type', values='raw_mark', aggfunc='mean')
-                display_df = pd.DataFrame(index=piv.index); wt = pd.Series(0.0, index=piv.index)
-                stages = {"Presentation 1 (10%)": {"weight": 10, "max": 50 if project_type == "Research Project" else 30},
-                        "Presentation 2 (10%)": {"weight": 10, "max": 20 if project_type == "Research Project" else 30},
-                        "Presentation 3 (20%)": {"weight": 20, "max": 30}}
-                for stage, info in stages.items():
-                    if stage in piv.columns:
-                        display_df[f"{stage.split(' (')[0]} (%)"] = ((piv[stage] / info['max']) * 100).round(1)
-                        wt += (piv[stage] / info['max']) * info['weight']
-                rep = "Final Research Report (60%)" if project_type == "Research Project" else "Final Design Report (60%)"
-                if rep in piv.columns:
-                    display_df["Final Report (%)"] = piv[rep].round(1)
-                    wt += (piv[rep] / 100) * 60
-                display_df['FINAL_GRADE_%'] = wt.round(1)
-                st.dataframe(pd.merge(base_df, display_df.reset_index(), on=target_col, how='left').fillna(0), use_container_width=True)
-
-        with manage_tab:
-            st.subheader(f"📤 Upload {project_type} Resources")
-            with st.form("resource_upload_form", clear_on_submit=True):
-                r_name = st.text_input("Resource Name (e.g. Project Template)")
-                r_link = st.text_input("Google Drive Link")
-                if st.form_submit_button("Add Resource"):
-                    if r_name and r_link:
-                        rd = load_data("resources")
-                        new_r = pd.DataFrame([{"resource_name": r_name, "stream": project_type, "download_link": r_link}])
-                        conn.update(worksheet="resources", data=pd.concat([rd, new_r], ignore_index=True))
-                        st.success(f"Added: {r_name}")
-                    else: st.error("Please provide both name and link.")
-# --- ROLE: PROJECT SUGGESTIONS ---
-elif role == "Project Suggestions":
-    st.header(f"🔭 Available {project_type} Suggestions")
-    ps_df = load_data("project_suggestions")
-    if not ps_df.empty:
-        filtered_ps = ps_df[ps_df['type'] == project_type]
-        if not filtered_ps.empty:
-            for _, row in filtered_ps.iterrows():
-                with st.expander(f"📌 {row['title']}"):
-                    st.write(f"**Supervisor:** {row['supervisor']} ({row['email']})")
-                    st.write(f"**Abstract:** {row['abstract']}")
-        else: st.info(f"No {project_type} suggestions available yet.")
-    else: st.info("No suggestions available yet.")
-
-# --- ROLE: RESOURCES ---
-elif role == "Resources":
-    st.header(f"📚 {project_type} Resources")
-    res_df = load_data("resources")
-    if not res_df.empty:
-        filtered_res = res_df[res_df['stream'] == project_type]
-        if not filtered_res.empty:
-            for _, row in filtered_res.iterrows():
-                col1, col2 = st.columns([3, 1])
-                with col1: st.write(f"📄 **{row['resource_name']}**")
-                with col2: st.link_button("Download", row['download_link'], use_container_width=True)
-        else: st.warning(f"No resources for {project_type} yet.")
-    else: st.info("No resources found.")
-
-
-
-
-
-
-
-
-
+import streamlit as st
+from streamlit_gsheets import GSheetsConnection
+import pandas as pd
+from datetime import datetime
+import functools
+import hashlib
+import time
+import numpy as np
+from auth import CredentialIndex, LoginThrottle
+from bulk_import import REGISTRATION_COLUMNS, grading_grid, marks_template, read_upload, validate_grid, validate_marks, validate_registrations
+from config import get_setting
+from export import FORMATS, export_grade_sheet
+from grading import CRITERIA, STREAMS, ExaminerIndex, GradeBook, stage_names
+from metrics import Metrics
+from moderation import Moderation
+from search import ResourceIndex, SuggestionIndex
+from shared_cache import SnapshotStore
+from storage import (SCHEMAS, ColumnIndex, GSheetsBackend, SharedWorksheetCache, SQLiteBackend, StaleWorksheetError, Storage,
+                     WorksheetCache, clean_id, normalise_frame)
+from throttle import ThrottledBackend
+
+# --- PAGE CONFIG ---
+st.set_page_config(page_title="UNAM DECE Projects Portal", layout="wide")
+
+# --- LOGO ---
+try:
+    st.sidebar.image("Logo_UNAM_Namibia.png", use_container_width=True)
+except:
+    st.sidebar.write("### UNAM JEDS")
+
+st.title("School of Engineering and the Built Environment")
+st.subheader("DECE PROJECTS PORTAL")
+
+# --- HELPERS ---
+def hash_password(password):
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+# --- STORAGE ---
+# `storage_backend` selects where worksheets live: "gsheets" (default) or "sqlite" for a
+# local database at `sqlite_path`. Reads go through a cache shared by every session in
+# this server process; an entry is refreshed whenever the portal writes the worksheet,
+# and edits made directly in the Google Sheet show up after `cache_max_staleness` seconds.
+# With several server processes on one host, set `shared_cache_dir` so they share one
+# snapshot of each worksheet: one process refreshes it and the rest read its snapshot,
+# and a write in any process is seen by all of them.
+# Every worksheet is also saved as Parquet under `mirror_dir` every `mirror_interval`
+# seconds: a restarted server renders from those copies while it re-reads the sheets, and
+# reads fall back to them when the sheet can't be reached (retrying it every
+# `offline_retry_seconds`). Registrations and other direct writes are refused while a
+# worksheet is only known from its copy.
+# Examiner marks go through a write-behind queue persisted at `write_queue_path` and are
+# flushed to the backend in batches every `write_queue_interval` seconds. Sheet calls,
+# loads, grading and whole reruns are timed into a rolling window of `metrics_window`
+# events, shown on the coordinator's Diagnostics tab.
+@st.cache_resource
+def get_storage():
+    sqlite = get_setting("storage_backend", "gsheets") == "sqlite"
+    if sqlite:
+        backend = SQLiteBackend(get_setting("sqlite_path", "portal.db"))
+    else:
+        # Coalesce concurrent identical reads and pace calls to the Sheets API quota
+        # (60 requests per minute per user by default)
+        backend = ThrottledBackend(GSheetsBackend(st.connection("gsheets", type=GSheetsConnection)),
+                                   rate=get_setting("sheets_requests_per_minute", 60) / 60.0,
+                                   burst=get_setting("sheets_burst", 10),
+                                   max_retries=get_setting("sheets_max_retries", 5))
+    cache_options = dict(max_entries=get_setting("cache_max_entries", 16),
+                         max_staleness=get_setting("cache_max_staleness", 300.0))
+    shared_dir = get_setting("shared_cache_dir", "")
+    if shared_dir:
+        cache = SharedWorksheetCache(SnapshotStore(shared_dir), **cache_options)
+    else:
+        cache = WorksheetCache(**cache_options)
+    storage = Storage(backend, cache, normalise=normalise_frame, metrics=Metrics(window=get_setting("metrics_window", 5000)),
+                      pull_interval=get_setting("pull_interval", 10.0), offline_retry=get_setting("offline_retry_seconds", 30.0))
+    # A local SQLite database needs no offline copy of itself
+    mirror_dir = get_setting("mirror_dir", "" if sqlite else "snapshots")
+    if mirror_dir:
+        storage.enable_mirror(mirror_dir, list(SCHEMAS), interval=get_setting("mirror_interval", 60.0))
+    if get_setting("write_behind", True):
+        storage.enable_write_behind(get_setting("write_queue_path", "write_queue.db"),
+                                    interval=get_setting("write_queue_interval", 2.0))
+    return storage
+
+store = get_storage()
+metrics = store.metrics
+rerun_started = time.perf_counter()
+offline_notice = st.sidebar.empty()
+
+def show_offline_notice():
+    stale = store.stale()
+    if stale:
+        now = time.time()
+        ages = ", ".join(f"{ws} ({(now - at) / 60:.0f} min old)" for ws, at in sorted(stale.items()))
+        if store.unreachable():
+            offline_notice.warning(f"📴 The Google Sheet can't be reached right now. Showing saved copies of: {ages}. "
+                                   "New registrations and uploads are paused; submitted marks are queued.")
+        else:
+            offline_notice.caption(f"🔄 Syncing with the Google Sheet; showing saved copies of: {ages}.")
+
+def unavailable(sheet_name, exc):
+    # Never carry on with an empty sheet in place of one that couldn't be read
+    st.error(f"⚠️ Couldn't load `{sheet_name}` and there is no saved copy yet. Please try again in a minute.")
+    st.caption(f"{type(exc).__name__}: {exc}")
+    show_offline_notice()
+    st.stop()
+
+# Worksheets already loaded during this script run. The script re-executes from the top on
+# every rerun, so each worksheet is fetched at most once per rerun and only by code that runs.
+rerun_frames = {}
+
+def load_data(sheet_name):
+    if sheet_name not in rerun_frames:
+        try:
+            with metrics.timed("load", "load_data", sheet_name):
+                rerun_frames[sheet_name] = store.load(sheet_name)
+        except Exception as exc:
+            unavailable(sheet_name, exc)
+    return rerun_frames[sheet_name]
+
+def find_rows(sheet_name, **where):
+    try:
+        return store.find(sheet_name, **where)
+    except Exception as exc:
+        unavailable(sheet_name, exc)
+
+def lookup_index(sheet_name, column, build=ColumnIndex):
+    # Only a sheet that can't be read gets the fallback; a failing build is a bug and surfaces as one
+    load_data(sheet_name)
+    return store.index(sheet_name, column, build=build)
+
+def find_group(student_id):
+    # Exact student_id -> group_name -> all members of that group
+    group_name = lookup_index("design_groups", "student_id").first(clean_id(student_id), "group_name")
+    return lookup_index("design_groups", "group_name").rows(group_name) if group_name is not None else pd.DataFrame()
+
+def not_saved():
+    st.error("⚠️ The Google Sheet can't be reached, so this couldn't be checked against the latest "
+             "entries and was not saved. Please submit again in a minute.")
+    show_offline_notice()
+    st.stop()
+
+def writable(sheet_name):
+    # Call before checking a submission against the sheet: a sheet served from its saved
+    # copy (e.g. just after a restart) is re-read first, so the check sees the latest rows
+    try:
+        if store.ensure_writable(sheet_name):
+            rerun_frames.pop(sheet_name, None)
+    except StaleWorksheetError:
+        not_saved()
+
+def append_data(sheet_name, rows):
+    # Sends only the new rows, so concurrent submissions never overwrite each other
+    rerun_frames.pop(sheet_name, None)
+    try:
+        store.append(sheet_name, rows)
+    except StaleWorksheetError:
+        not_saved()
+
+def enqueue_data(sheet_name, rows):
+    rerun_frames.pop(sheet_name, None)
+    store.enqueue(sheet_name, rows)
+
+# --- LAZY TABS ---
+# Only the selected tab's body runs, so hidden tabs don't load their worksheets. Streamlit
+# versions without stateful tabs fall back to running every tab.
+def lazy_tabs(labels, key):
+    try:
+        return st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        return st.tabs(labels)
+
+def tab_open(tab):
+    return getattr(tab, "open", None) is not False
+
+# --- LOGIN ---
+# Logins check a username-keyed index of the users sheet (rebuilt when the sheet changes).
+# After `login_max_attempts` failures within `login_window` seconds a username is locked
+# for `login_lockout` seconds, across all sessions of this server process.
+@st.cache_resource
+def get_login_throttle():
+    return LoginThrottle(max_attempts=get_setting("login_max_attempts", 5),
+                         window=get_setting("login_window", 300.0),
+                         lockout=get_setting("login_lockout", 300.0))
+
+# --- GRADING ---
+# Stage averages, criteria and grades for a whole stream are computed in one pass and
+# reused until the marks sheet changes, so looking up one student is a dictionary hit.
+@st.cache_resource
+def get_grade_book():
+    return GradeBook()
+
+grade_book = get_grade_book()
+
+def stream_scores(stream):
+    ws = STREAMS[stream]["marks"]
+    with metrics.timed("compute", "scores table", ws):
+        return grade_book.scores(stream, store.version(ws), lambda: load_data(ws))
+
+def show_scores(stream, entity_id):
+    table = stream_scores(stream)
+    stage_rows, total = table.lookup(entity_id)
+    if stage_rows.empty:
+        st.info("No scores recorded yet. Check back after your presentations.")
+        return
+
+    for (_, stage), row in stage_rows.iterrows():
+        with st.expander(f"**{stage}** — {row['raw_mark']:.1f} / {int(row['max'])}  ({row['pct']}%)", expanded=True):
+            st.caption(f"Averaged from {int(row['examiners'])} examiner(s)")
+
+            # Criteria breakdown
+            labels = table.stage_config[stage]["criteria"]
+            crit_data = [{"Criterion": label, "Avg Score": f"{row[col]:.1f} / 10"}
+                         for label, col in zip(labels, CRITERIA) if label and pd.notna(row[col])]
+            if crit_data:
+                st.write("**Criteria Breakdown:**")
+                st.dataframe(pd.DataFrame(crit_data), hide_index=True, use_container_width=True)
+
+            # Examiner remarks
+            remarks_list = table.remarks(entity_id, stage)
+            if remarks_list:
+                st.write("**💬 Examiner Remarks:**")
+                for remark in remarks_list:
+                    st.markdown(f"> *\"{remark}\"*")
+            else:
+                st.caption("No remarks provided for this stage.")
+
+    # Overall grade summary
+    total_weighted, total_weight_so_far = total['weighted'], int(total['weight'])
+    st.divider()
+    st.subheader("🏆 Grade Summary")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Weighted Score So Far", f"{total_weighted:.1f} / {total_weight_so_far}")
+    with col2:
+        if total_weight_so_far == 100:
+            st.metric("Final Grade", f"{total_weighted:.1f}%", delta=total['letter'])
+        else:
+            remaining = 100 - total_weight_so_far
+            st.metric("Assessments Remaining", f"{remaining}% weight outstanding")
+
+# --- OPTIONS FOR SELECT SLIDER ---
+mark_options = [float(x) for x in np.arange(0, 10.5, 0.5)]
+
+# --- PANELS ---
+# Lookups and the scoring form run as fragments: interacting with one reruns only that
+# function, with the stream (and examiner) passed in, not the sidebar, the other tabs or
+# their sheet loads. Each run starts a fresh per-run memo of loaded worksheets.
+def panel(fn, run_every=None):
+    fragment = getattr(st, "fragment", None)
+    if fragment is None:
+        return fn
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        rerun_frames.clear()
+        with metrics.timed("fragment", fn.__name__):
+            return fn(*args, **kwargs)
+    return fragment(run, run_every=run_every)
+
+@panel
+def registration_lookup(stream):
+    st.header("🔍 View Registration Details")
+    if stream == "Research Project":
+        search_id = st.text_input("Enter Student ID to find your details")
+        if search_id:
+            match = find_rows("students", student_id=clean_id(search_id))
+            if not match.empty:
+                st.write("### Your Registration Information")
+                # Using st.dataframe with column_config for better resizing
+                st.dataframe(
+                    match,
+                    column_config={
+                        "student_id": st.column_config.TextColumn("Student ID", width="small"),
+                        "student_name": st.column_config.TextColumn("Full Name", width="medium"),
+                        "email": st.column_config.TextColumn("Email", width="medium"),
+                        "supervisor": st.column_config.TextColumn("Supervisor", width="medium"),
+                        "research_title": st.column_config.TextColumn("Research Title", width="large"),
+                        "abstract": st.column_config.TextColumn("Abstract", width="large"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+            else: 
+                st.warning("No registration found for this ID.")
+    else:
+        search_group = st.text_input("Enter your student ID to find group details")
+        if search_group:
+            match = find_group(search_group)
+            if not match.empty:
+                st.write("### Group Registration Information")
+                st.dataframe(
+                    match,
+                    column_config={
+                        "group_name": st.column_config.TextColumn("Group Name", width="large"),
+                        "student_name": st.column_config.TextColumn("Member Name", width="medium"),
+                        "student_id": st.column_config.TextColumn("Student ID", width="small"),
+                        "supervisor": st.column_config.TextColumn("Supervisor", width="medium"),
+                        "abstract": st.column_config.TextColumn("Abstract", width="large"),
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+            else: 
+                st.warning("No registration found for this student ID.")
+
+@panel
+def scores_lookup(stream):
+    st.header("📊 My Assessment Scores & Feedback")
+    st.info("Enter your Student ID (or Group ID for Design Projects) to view your scores and examiner comments.")
+
+    if stream == "Research Project":
+        search_scores_id = st.text_input("Enter your Student ID", key="scores_search_id")
+        if search_scores_id:
+            ci = clean_id(search_scores_id)
+            student_match = find_rows("students", student_id=ci)
+            if student_match.empty:
+                st.warning("No student registration found for this ID.")
+            else:
+                st.success(f"👤 Student: **{student_match.iloc[0]['student_name']}** | Supervisor: {student_match.iloc[0]['supervisor']}")
+                show_scores(stream, ci)
+
+    else:  # Design Project
+        search_group_id = st.text_input("Enter your Student ID to find your group scores", key="scores_group_search")
+        if search_group_id:
+            member_match = find_group(search_group_id)
+            if member_match.empty:
+                st.warning("No design group found for this Student ID.")
+            else:
+                group_name = member_match.iloc[0]['group_name']
+                st.success(f"👥 Group: **{group_name}** | Supervisor: {member_match.iloc[0]['supervisor']}")
+                show_scores(stream, group_name)
+
+@panel
+def scoring_panel(stream, examiner_name, examiner_username):
+    ws = "design_marks" if stream == "Design Project" else "marks"
+    if stream == "Research Project":
+        by_id, by_name = lookup_index("students", "student_id"), lookup_index("students", "student_name")
+        id_list = [""] + by_id.keys()
+        name_list = [""] + by_name.keys()
+        if 'sel_id' not in st.session_state: st.session_state.sel_id = ""
+        if 'sel_name' not in st.session_state: st.session_state.sel_name = ""
+        def update_by_id(): st.session_state.sel_name = by_id.first(st.session_state.sel_id, 'student_name', "") if st.session_state.sel_id else ""
+        def update_by_name(): st.session_state.sel_id = by_name.first(st.session_state.sel_name, 'student_id', "") if st.session_state.sel_name else ""
+        col1, col2 = st.columns(2)
+        with col1: target_id = st.selectbox("Select Student ID", options=id_list, key="sel_id", on_change=update_by_id)
+        with col2: target_name = st.selectbox("Select Student Name", options=name_list, key="sel_name", on_change=update_by_name)
+        if target_id:
+            student_info = by_id.rows(target_id)
+            if not student_info.empty and 'research_title' in student_info.columns:
+                st.info(f"📄 **Research Title:** {student_info.iloc[0]['research_title']}")
+        f_stage = st.selectbox("Assessment Stage", ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Research Report (60%)"])
+    else:
+        by_group = lookup_index("design_groups", "group_name")
+        target_id = st.selectbox("Select Design Group", options=[""] + by_group.keys())
+        if target_id:
+            group_info = by_group.rows(target_id)
+            if not group_info.empty:
+                supervisor = group_info.iloc[0].get('supervisor', 'N/A')
+                st.info(f"🏗️ **Project Title:** {target_id}  |  **Supervisor:** {supervisor}")
+        f_stage = st.selectbox("Assessment Stage", ["Presentation 1 (10%)", "Presentation 2 (10%)", "Presentation 3 (20%)", "Final Design Report (60%)"])
+
+    with st.form("score_form", clear_on_submit=True):
+        st.write(f"**Target ID:** {target_id}")
+        m_c1 = m_c2 = m_c3 = m_c4 = m_c5 = 0.0 # Criteria initialization
+
+        if "Report" in f_stage:
+            st.subheader("📝 Final Report Mark")
+            raw_mark = st.number_input("Mark (0-100)", 0.0, 100.0, step=0.5)
+        elif stream == "Research Project":
+            if "Presentation 1" in f_stage:
+                st.subheader("🏗️ Proposal Assessment (Out of 50)")
+                m_c1 = st.select_slider("1. Problem statement (LO 1, 2, ECN 4)", options=mark_options)
+                st.caption("Guidelines: Problem clearly defined (WHAT/WHERE/WHEN/HOW/WHY), scope, significance.")
+                m_c2 = st.select_slider("2. Literature Review (LO 6)", options=mark_options)
+                st.caption("Guidelines: Cite/reference ability, critique related work, identify gaps.")
+                m_c3 = st.select_slider("3. Methodology (LO 2, 3, ECN 5)", options=mark_options)
+                st.caption("Guidelines: Identify approaches, valid design, specify ICT tools.")
+                m_c4 = st.select_slider("4. Project Planning (LO 1)", options=mark_options)
+                st.caption("Guidelines: Plan with valid milestones and resources.")
+                m_c5 = st.select_slider("5. Technical Communication (LO 5, ECN 6)", options=mark_options)
+                st.caption("Guidelines: Presentation, terminology, illustrations, Q&A defense.")
+                raw_mark = float(m_c1 + m_c2 + m_c3 + m_c4 + m_c5)
+            elif "Presentation 2" in f_stage:
+                st.subheader("📊 Progress Assessment (Out of 20)")
+                m_c1 = st.select_slider("1. Progress (LO 1, 2, 4, ECN 4)", options=mark_options)
+                st.caption("Guidelines: Adherence to method, setup, analysis, milestones.")
+                m_c2 = st.select_slider("2. Technical Communication (LO 5, ECN 6)", options=mark_options)
+                st.caption("Guidelines: Graphs/flowcharts, terminology, Q&A.")
+                raw_mark = float(m_c1 + m_c2)
+            else: 
+                st.subheader("🏁 Final Presentation Assessment (Out of 30)")
+                m_c1 = st.select_slider("1. Data Collection (LO 1, 2, 3, ECN 4, 5)", options=mark_options)
+                st.caption("Guidelines: Valid data collection, appropriate tools, effective display.")
+                m_c2 = st.select_slider("2. Data analysis and interpretation (LO 1, 2, 3, ECN 4, 5)", options=mark_options)
+                st.caption("Guidelines: ICT tools, results vs objectives, valid conclusions.")
+                m_c3 = st.select_slider("3. Technical Communication (LO 5, ECN 6)", options=mark_options)
+                st.caption("Guidelines: Presentation of findings, defense of research.")
+                raw_mark = float(m_c1 + m_c2 + m_c3)
+        else: # DESIGN STREAM
+            if "Presentation 1" in f_stage:
+                st.subheader("🏗️ Design Proposal (Out of 30)")
+                m_c1 = st.select_slider("Problem Statement & Justification", options=mark_options)
+                st.caption("Guidelines: Identification of engineering problem and scope.")
+                m_c2 = st.select_slider("Comparison Matrix", options=mark_options)
+                st.caption("Guidelines: Selection of optimal solution based on metrics.")
+                m_c3 = st.select_slider("Materials & Methods", options=mark_options)
+                st.caption("Guidelines: Component suitability and design methodology.")
+            elif "Presentation 2" in f_stage:
+                st.subheader("📊 Progress Presentation (Out of 30)")
+                m_c1 = st.select_slider("Sustainability Analysis (LO 1, 2, 4)", options=mark_options)
+                st.caption("Guidelines: Environmental and social impact considerations.")
+                m_c2 = st.select_slider("Technical Comms (LO 5)", options=mark_options)
+                st.caption("Guidelines: Quality of diagrams, schematics, and flow.")
+                m_c3 = st.select_slider("Q&A Defense", options=mark_options)
+                st.caption("Guidelines: Addressing technical queries about the design.")
+            else: 
+                st.subheader("🏁 Final Presentation (Out of 30)")
+                m_c1 = st.select_slider("Design Approaches (LO 4, 7)", options=mark_options)
+                st.caption("Guidelines: Engineering standards and design synthesis.")
+                m_c2 = st.select_slider("Synthesis & Results (LO 1, 4)", options=mark_options)
+                st.caption("Guidelines: Validation through testing and data.")
+                m_c3 = st.select_slider("Prototype Functionality (LO 7)", options=mark_options)
+                st.caption("Guidelines: Demonstration of prototype/built design.")
+            raw_mark = float(m_c1 + m_c2 + m_c3)
+
+        remarks = st.text_area("Remarks")
+        initials = st.text_input("Initials (Required)")
+        if st.form_submit_button("Submit Marks"):
+            if not target_id or not initials.strip(): st.error("Fill required fields.")
+            else:
+                id_col = "student_id" if stream == "Research Project" else "group_name"
+                new_row = pd.DataFrame([{id_col: target_id, "assessment_type": f_stage, "raw_mark": raw_mark, 
+                                         "crit_1": m_c1, "crit_2": m_c2, "crit_3": m_c3, "crit_4": m_c4, "crit_5": m_c5, # Mapping criteria
+                                         "examiner": f"{examiner_name} ({initials.upper()})", 
+                                         "remarks": remarks, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                                         "examiner_username": examiner_username}])
+                enqueue_data(ws, new_row)
+                st.success("Marks & Individual Criteria saved successfully! They will sync to the sheet in the background.")
+
+# Batch grading: every student/group of the stream in one editable grid for a stage, with the
+# stage's rubric criteria as columns. The grid enforces the 0-10 / 0.5 steps as marks are
+# typed, totals and checks are recomputed on each edit without touching the sheet, and the
+# whole session is queued as a single write.
+@panel
+def batch_grading_panel(stream, examiner_name, examiner_username):
+    cfg = STREAMS[stream]
+    id_col, ws = cfg["id_col"], cfg["marks"]
+    stage = st.selectbox("Assessment Stage", stage_names(stream), key="batch_stage")
+    stage_cfg = {s["stage"]: s for s in cfg["stages"]}[stage]
+    registry = load_data(cfg["registry"])
+    mine = lookup_index(ws, "examiner", build=ExaminerIndex).rows(examiner_username, examiner_name)
+    graded = mine.loc[mine["assessment_type"] == stage, id_col] if id_col in mine.columns and "assessment_type" in mine.columns else []
+    grid = grading_grid(registry, stream, stage, graded)
+    if grid.empty:
+        st.info("No students/groups are registered yet.")
+        return
+
+    notice = st.session_state.pop("batch_notice", None)
+    if notice: st.success(notice)
+    columns = {
+        id_col: st.column_config.TextColumn("Student ID" if stream == "Research Project" else "Group"),
+        "details": st.column_config.TextColumn("Name" if stream == "Research Project" else "Supervisor"),
+        "graded": st.column_config.CheckboxColumn("Marked by you"),
+        "raw_mark": st.column_config.NumberColumn(f"Mark (0-{stage_cfg['max']})", min_value=0.0, max_value=float(stage_cfg["max"]), step=0.5),
+        "remarks": st.column_config.TextColumn("Remarks"),
+    }
+    columns.update({c: st.column_config.NumberColumn(label, min_value=0.0, max_value=10.0, step=0.5)
+                    for c, label in zip(CRITERIA, stage_cfg["criteria"]) if label})
+    if 'batch_round' not in st.session_state: st.session_state.batch_round = 0
+    edited = st.data_editor(grid, column_config=columns, disabled=[id_col, "details", "graded"], hide_index=True,
+                            use_container_width=True, key=f"batch_grid_{stream}_{stage}_{st.session_state.batch_round}")
+
+    initials = st.text_input("Initials (Required)", key="batch_initials")
+    accepted, errors = validate_grid(edited, stream, stage, registry, f"{examiner_name} ({initials.strip().upper()})")
+    if len(accepted):
+        totals = accepted[[id_col, "raw_mark"]].rename(columns={"raw_mark": f"Total / {stage_cfg['max']}"})
+        totals["%"] = (accepted["raw_mark"] / stage_cfg["max"] * 100).round(1)
+        st.write(f"**Ready to submit ({len(accepted)}):**")
+        st.dataframe(totals, hide_index=True, use_container_width=True)
+    if len(errors):
+        st.error(f"{len(errors)} problem(s) to fix before submitting:")
+        st.dataframe(errors, hide_index=True, use_container_width=True)
+    if st.button(f"Submit {len(accepted)} Mark(s)", type="primary", disabled=not len(accepted) or bool(len(errors)) or not initials.strip()):
+        accepted = accepted.assign(examiner_username=examiner_username)
+        enqueue_data(ws, accepted)
+        st.session_state.batch_notice = f"{len(accepted)} mark(s) saved! They will sync to the sheet in the background."
+        st.session_state.batch_round += 1
+        st.rerun()
+
+# --- AUTHENTICATION STATE ---
+if 'logged_in' not in st.session_state:
+    st.session_state['logged_in'] = False
+    st.session_state['user_name'] = ""
+    st.session_state['user_username'] = ""
+    st.session_state['user_email'] = ""
+
+# --- SIDEBAR NAVIGATION ---
+st.sidebar.header("Navigation")
+# Added "Resources" to the Menu
+role = st.sidebar.radio("Management Menu", ["Registration", "Panelist / Examiner", "Coordinator", "Project Suggestions", "Resources"])
+project_type = st.sidebar.radio("Select Stream", ["Research Project", "Design Project"])
+
+# Suggestions and resources are searched through a word index of the sheet (rebuilt when it
+# changes) and shown `page_size` at a time, so a page renders a bounded number of widgets.
+def paginate(index, hits, key):
+    size = get_setting("page_size", 20)
+    pages = max(1, -(-len(hits) // size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key) if pages > 1 else 1
+    st.caption(f"{len(hits)} match(es) · page {page} of {pages}")
+    return index.rows(hits[(page - 1) * size:page * size])
+
+@panel
+def suggestion_browser(stream):
+    index = lookup_index("project_suggestions", "type", build=SuggestionIndex)
+    if index.empty:
+        st.info("No suggestions available yet.")
+        return
+    c1, c2 = st.columns([2, 1])
+    query = c1.text_input("🔎 Search titles, abstracts and supervisors", key="ps_query")
+    supervisor = c2.selectbox("Supervisor", ["All"] + index.supervisor_names(stream), key="ps_supervisor")
+    hits = index.search(query, group=stream, supervisor=None if supervisor == "All" else supervisor)
+    if not len(hits):
+        st.info(f"No {stream} suggestions match." if query or supervisor != "All" else f"No {stream} suggestions available yet.")
+        return
+    # A new search starts again from page 1
+    for row in paginate(index, hits, key=f"ps_page_{hash((stream, query, supervisor))}").itertuples(index=False):
+        with st.expander(f"📌 {row.title}"):
+            st.write(f"**Supervisor:** {row.supervisor} ({row.email})")
+            st.write(f"**Abstract:** {row.abstract}")
+
+@panel
+def resource_browser(stream):
+    index = lookup_index("resources", "stream", build=ResourceIndex)
+    if index.empty:
+        st.info("No resources found.")
+        return
+    query = st.text_input("🔎 Search resources", key="res_query")
+    hits = index.search(query, group=stream)
+    if not len(hits):
+        st.warning(f"No resources match “{query}”." if query else f"No resources for {stream} yet.")
+        return
+    for row in paginate(index, hits, key=f"res_page_{hash((stream, query))}").itertuples(index=False):
+        col1, col2 = st.columns([3, 1])
+        with col1: st.write(f"📄 **{row.resource_name}**")
+        with col2: st.link_button("Download", row.download_link, use_container_width=True)
+
+# The coordinator grade sheet follows the marks sheet's change feed: each refresh pulls only
+# the rows added since the last one and regrades the students/groups they touch. Rows whose
+# grades changed since this session's previous refresh are flagged for a few minutes.
+def grade_view(stream):
+    cfg = STREAMS[stream]
+    id_col = cfg["id_col"]
+    base_df = load_data(cfg["registry"])
+    if base_df.empty:
+        return
+    with metrics.timed("compute", "grade sheet", cfg["marks"]):
+        sheet = grade_book.follow(stream, functools.partial(store.changes, cfg["marks"]))
+        pending = store.pending(cfg["marks"])
+        table = sheet.table(base_df, store.version(cfg["registry"]), pending, store.version(cfg["marks"])[1])
+    if sheet.empty and pending is None:
+        return
+
+    grade_cols = [c for c in table.columns if c.endswith("(%)") or c == "FINAL_GRADE_%"]
+    rows = table.drop_duplicates(id_col)
+    current = pd.Series(pd.util.hash_pandas_object(rows[grade_cols], index=False).to_numpy(), index=rows[id_col].to_numpy())
+    seen = st.session_state.get("grade_rows")
+    now = time.time()
+    new = {k: t for k, t in st.session_state.get("newly_graded", {}).items()
+           if now - t < get_setting("new_grade_highlight_seconds", 300)}
+    if seen is not None and seen[0] == stream:
+        # Grades that changed, plus newly registered ids that already have one
+        known = current.index.isin(seen[1].index)
+        changed = rows["FINAL_GRADE_%"].to_numpy() > 0
+        changed[known] = current[known].to_numpy() != seen[1].reindex(current.index[known]).to_numpy()
+        new.update(dict.fromkeys(current.index[changed], now))
+    else:
+        new = {}
+    st.session_state.grade_rows, st.session_state.newly_graded = (stream, current), new
+
+    if new:
+        flagged = table[id_col].isin(list(new))
+        table = table.assign(**{"🆕": flagged})[["🆕"] + list(table.columns)]
+        st.success(f"🆕 {len(new)} newly graded since you opened this view.")
+        st.dataframe(table[flagged], use_container_width=True, hide_index=True)
+    st.dataframe(table, use_container_width=True)
+    st.caption(f"Updated {datetime.now().strftime('%H:%M:%S')}")
+
+    # The export is built only when the button is clicked, outside this rerun, from the
+    # grades shown above (bound as defaults, since globals change per rerun) and the marks then
+    fmt = st.radio("Export Format", list(FORMATS), horizontal=True, key="export_format")
+    ext, mime = FORMATS[fmt]
+    def build_export(fmt=fmt, stream=stream, grades=table.drop(columns="🆕", errors="ignore"), ws=cfg["marks"]):
+        with metrics.timed("export", FORMATS[fmt][0], ws):
+            marks = store.load(ws)
+            scores = grade_book.scores(stream, store.version(ws), lambda: marks)
+            return export_grade_sheet(fmt, stream, grades, scores, marks)
+    st.download_button("⬇️ Export Grade Sheet", build_export, mime=mime, on_click="ignore",
+                       file_name=f"{stream.lower().replace(' ', '_')}_grades_{datetime.now().strftime('%Y%m%d')}.{ext}")
+
+# Moderation statistics are computed once per marks-sheet version and shared by every session
+def moderation_view(stream):
+    ws = STREAMS[stream]["marks"]
+    with metrics.timed("compute", "moderation", ws):
+        mod = grade_book.derived("moderation", stream, store.version(ws), lambda: Moderation(load_data(ws), stream))
+    if mod.per_examiner.empty:
+        st.info("No marks submitted yet.")
+        return
+    stage = st.selectbox("Stage", ["All stages"] + mod.order, key="mod_stage")
+    stage = None if stage == "All stages" else stage
+    threshold = float(get_setting("moderation_spread_threshold", 15))
+    leniency, spread, outliers = mod.leniency(stage), mod.spread(stage, threshold), mod.outliers(stage)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Examiners", len(leniency))
+    c2.metric("Co-marked", len(spread))
+    c3.metric(f"Spread ≥ {threshold:g} pts", int(spread["flagged"].sum()))
+    c4.metric("Outlier Marks", len(outliers))
+
+    st.write("**Examiner leniency** — mean % points above (+) or below (−) the other examiners of the same student/group")
+    st.bar_chart(leniency.dropna(subset=["leniency"]).set_index("examiner")["leniency"])
+    st.dataframe(leniency, hide_index=True, use_container_width=True)
+    st.write("**Inter-examiner spread** (% of the stage mark)")
+    st.dataframe(spread, hide_index=True, use_container_width=True)
+    st.write("**Outlier marks** — far from the other examiners' mean for the same student/group")
+    st.dataframe(outliers, hide_index=True, use_container_width=True)
+    st.write("**Criterion scores**")
+    criteria = mod.criteria()
+    st.dataframe(criteria if stage is None else criteria[criteria["stage"] == stage], hide_index=True, use_container_width=True)
+    if stage is not None and not mod.distribution(stage).empty:
+        st.bar_chart(mod.distribution(stage))
+
+# --- ROLE: REGISTRATION ---
+if role == "Registration":
+    reg_tab, view_tab, scores_tab = lazy_tabs(["New Registration", "Check My Registration", "📊 View My Scores"], key="registration_tabs")
+    
+    if tab_open(reg_tab):
+        with reg_tab:
+            if project_type == "Research Project":
+                st.header("📝 Student Research Registration")
+                with st.form("reg_form", clear_on_submit=True):
+                    n = st.text_input("Full Name")
+                    i = st.text_input("Student ID")
+                    e = st.text_input("Email")
+                    s = st.text_input("Supervisor")
+                    t = st.text_area("Research Title")
+                    abst = st.text_area("Research Abstract (Max 250 words)")
+                
+                    if st.form_submit_button("Submit Registration"):
+                        ci = clean_id(i)
+                        word_count = len(abst.split())
+                        if not all([n, ci, e, s, t, abst]): st.error("Please fill in all fields.")
+                        elif word_count > 250: st.error(f"Abstract too long ({word_count} words).")
+                        else:
+                            nr = pd.DataFrame([{"student_id":ci,"student_name":n,"email":e,"supervisor":s,"research_title":t, "abstract": abst}])
+                            append_data("students", nr)
+                            st.success("Research Registered!")
+            else:
+                st.header("👥 Design Project Group Registration")
+                with st.form("design_reg_form", clear_on_submit=True):
+                    g_name = st.text_input("Group Name / Project Title")
+                    superv = st.text_input("Supervisor")
+                    g_abst = st.text_area("Project Abstract (Max 250 words)")
+                    st.write("--- Group Members (Min 2) ---")
+                    m1_n = st.text_input("M1 Name"); m1_id = st.text_input("M1 ID")
+                    m2_n = st.text_input("M2 Name"); m2_id = st.text_input("M2 ID")
+                    m3_n = st.text_input("M3 Name"); m3_id = st.text_input("M3 ID")
+                    m4_n = st.text_input("M4 Name (Optional)"); m4_id = st.text_input("M4 ID (Optional)")
+                    if st.form_submit_button("Submit Group Registration"):
+                        word_count = len(g_abst.split())
+                        if not all([g_name, superv, g_abst, m1_n, m1_id, m2_n, m2_id]):
+                            st.error("Please fill in all fields, if no supervisor type TBA. Also make sure atleast 2 people per group!")
+                        elif word_count > 250: st.error(f"Abstract too long ({word_count} words).")
+                        else:
+                            new_mems = []
+                            for name, sid in [(m1_n, m1_id), (m2_n, m2_id), (m3_n, m3_id), (m4_n, m4_id)]:
+                                if name and sid:
+                                    new_mems.append({"group_name": g_name, "student_name": name, "student_id": clean_id(sid), "supervisor": superv, "abstract": g_abst})
+                            append_data("design_groups", pd.DataFrame(new_mems))
+                            st.success("Design Group Registered!")
+
+    if tab_open(view_tab):
+        with view_tab:
+            registration_lookup(project_type)
+
+    if tab_open(scores_tab):
+        with scores_tab:
+            scores_lookup(project_type)
+
+# --- ROLE: PANELIST / EXAMINER ---
+elif role == "Panelist / Examiner":
+    st.header(f"🧑‍🏫 Examiner Portal ({project_type})")
+    if not st.session_state['logged_in']:
+        tab1, tab2 = st.tabs(["Login", "Create Account"])
+        with tab1:
+            with st.form("login_form"):
+                l_user, l_pw = st.text_input("Username"), st.text_input("Password", type="password")
+                if st.form_submit_button("Login"):
+                    # The name the accounts are keyed by, so spaces can't dodge the lockout
+                    l_user = l_user.strip()
+                    throttle = get_login_throttle()
+                    wait = throttle.retry_after(l_user)
+                    account = lookup_index("users", "username", build=CredentialIndex).verify(l_user, hash_password(l_pw)) if not wait else None
+                    if account:
+                        throttle.success(l_user)
+                        st.session_state['logged_in'] = True
+                        st.session_state['user_name'] = account['full_name']
+                        st.session_state['user_username'] = account['username']
+                        st.session_state['user_email'] = account['email']
+                        st.rerun()
+                    elif wait: st.error(f"Too many failed attempts. Try again in {int(wait // 60) + 1} minute(s).")
+                    else:
+                        throttle.failure(l_user)
+                        st.error("Invalid credentials.")
+        with tab2:
+            with st.form("create_acc"):
+                reg_full, reg_user, reg_pw, reg_email, auth_key = st.text_input("Full Name"), st.text_input("Username"), st.text_input("Password", type="password"), st.text_input("Email"), st.text_input("Department Key", type="password")
+                if st.form_submit_button("Create Account"):
+                    writable("users")
+                    if auth_key != "JEDSECE2026": st.error("Invalid Key.")
+                    elif not all([reg_full, reg_user.strip(), reg_pw]): st.error("Please fill in your name, username and password.")
+                    elif reg_user.strip() in lookup_index("users", "username", build=CredentialIndex): st.error("That username is already taken.")
+                    else:
+                        new_u = pd.DataFrame([{"full_name": reg_full, "username": reg_user.strip(), "password": hash_password(reg_pw), "email": reg_email}])
+                        append_data("users", new_u)
+                        st.success("Account created!")
+    else:
+        st.sidebar.info(f"Signed in: {st.session_state['user_name']}")
+        if st.sidebar.button("Sign Out"): st.session_state['logged_in'] = False; st.rerun()
+        
+        assess_tab, batch_tab, history_tab, suggest_tab = lazy_tabs(["Assess Students", "🗂️ Batch Grading", "📋 My Score History", "Suggest New Projects"], key="examiner_tabs")
+        
+        if tab_open(assess_tab):
+            with assess_tab:
+                scoring_panel(project_type, st.session_state['user_name'], st.session_state['user_username'])
+
+        if tab_open(batch_tab):
+            with batch_tab:
+                batch_grading_panel(project_type, st.session_state['user_name'], st.session_state['user_username'])
+
+        if tab_open(history_tab):
+            with history_tab:
+                st.subheader(f"📋 My Submitted Scores — {project_type}")
+                ws_h = "design_marks" if project_type == "Design Project" else "marks"
+                h_df = load_data(ws_h)
+
+                if h_df.empty:
+                    st.info("No scores have been submitted yet.")
+                else:
+                    my_rows = lookup_index(ws_h, "examiner", build=ExaminerIndex).rows(st.session_state['user_username'], st.session_state['user_name'])
+                    if my_rows.empty:
+                        st.info("You have not submitted any scores yet for this stream.")
+                    else:
+                        id_col = "student_id" if project_type == "Research Project" else "group_name"
+                        id_label = "Student ID" if project_type == "Research Project" else "Group Name"
+                        by_stage = dict(tuple(my_rows.groupby('assessment_type', sort=True, observed=True))) if 'assessment_type' in my_rows.columns else {}
+
+                        # Summary metrics
+                        total_submissions = len(my_rows)
+                        unique_students = my_rows[id_col].nunique() if id_col in my_rows.columns else 0
+                        stages_covered = len(by_stage)
+                        c1, c2, c3 = st.columns(3)
+                        c1.metric("Total Submissions", total_submissions)
+                        c2.metric(f"Unique {id_label}s Assessed", unique_students)
+                        c3.metric("Assessment Stages Covered", stages_covered)
+
+                        st.divider()
+
+                        # Filter controls
+                        all_stages = list(by_stage)
+                        filter_stage = st.selectbox("Filter by Stage", ["All Stages"] + all_stages)
+
+                        # Display grouped by stage
+                        for stage in (all_stages if filter_stage == "All Stages" else [filter_stage]):
+                            stage_rows = by_stage[stage]
+                            with st.expander(f"**{stage}** — {len(stage_rows)} submission(s)", expanded=True):
+                                display_cols = [id_col, 'raw_mark', 'crit_1', 'crit_2', 'crit_3', 'crit_4', 'crit_5', 'remarks', 'timestamp']
+                                display_cols = [c for c in display_cols if c in stage_rows.columns]
+                                rename_map = {
+                                    id_col: id_label, 'raw_mark': 'Total Mark',
+                                    'crit_1': 'C1', 'crit_2': 'C2', 'crit_3': 'C3', 'crit_4': 'C4', 'crit_5': 'C5',
+                                    'remarks': 'Remarks', 'timestamp': 'Submitted At'
+                                }
+                                st.dataframe(
+                                    stage_rows[display_cols].rename(columns=rename_map),
+                                    hide_index=True,
+                                    use_container_width=True,
+                                    column_config={
+                                        id_label: st.column_config.TextColumn(id_label, width="small"),
+                                        "Total Mark": st.column_config.NumberColumn("Total Mark", format="%.1f"),
+                                        "Remarks": st.column_config.TextColumn("Remarks", width="large"),
+                                        "Submitted At": st.column_config.TextColumn("Submitted At", width="medium"),
+                                    }
+                                )
+
+        if tab_open(suggest_tab):
+            with suggest_tab:
+                st.subheader("💡 Suggest a New Project")
+                with st.form("new_suggest_form", clear_on_submit=True):
+                    s_type = st.radio("Category", ["Research Project", "Design Project"])
+                    s_title = st.text_input("Title")
+                    s_abstract = st.text_area("Abstract")
+                    if st.form_submit_button("Post"):
+                        new_s = pd.DataFrame([{"type": s_type, "title": s_title, "abstract": s_abstract, 
+                                               "supervisor": st.session_state['user_name'], "email": st.session_state['user_email']}])
+                        append_data("project_suggestions", new_s)
+                        st.success("Posted!")
+
+# --- ROLE: COORDINATOR ---
+elif role == "Coordinator":
+    st.header("🔑 Coordinator Dashboard")
+    pwd = st.sidebar.text_input("Password", type="password")
+    if (project_type == "Research Project" and pwd == "Blackberry") or (project_type == "Design Project" and pwd == "Apple"):
+        grade_tab, moderation_tab, manage_tab, import_tab, diag_tab = lazy_tabs(["View Grades", "⚖️ Moderation", "Manage Resources", "📥 Bulk Import", "🩺 Diagnostics"], key="coordinator_tabs")
+        pending = store.pending_count()
+        if pending:
+            st.info(f"⏳ {pending} submitted mark(s) pending sync to the sheet.")
+            if store.queue.last_error:
+                st.caption(f"Last sync error: {store.queue.last_error}")
+        
+        if tab_open(grade_tab):
+            with grade_tab:
+                # Re-runs just the grade sheet every `coordinator_refresh_seconds` while ticked
+                auto = st.checkbox("Auto-refresh", value=True, key="grades_auto_refresh")
+                interval = get_setting("coordinator_refresh_seconds", 30)
+                panel(grade_view, run_every=interval if auto else None)(project_type)
+
+        if tab_open(moderation_tab):
+            with moderation_tab:
+                st.subheader(f"⚖️ Examiner Moderation — {project_type}")
+                moderation_view(project_type)
+
+        if tab_open(manage_tab):
+            with manage_tab:
+                st.subheader(f"📤 Upload {project_type} Resources")
+                with st.form("resource_upload_form", clear_on_submit=True):
+                    r_name = st.text_input("Resource Name (e.g. Project Template)")
+                    r_link = st.text_input("Google Drive Link")
+                    if st.form_submit_button("Add Resource"):
+                        if r_name and r_link:
+                            new_r = pd.DataFrame([{"resource_name": r_name, "stream": project_type, "download_link": r_link}])
+                            append_data("resources", new_r)
+                            st.success(f"Added: {r_name}")
+                        else: st.error("Please provide both name and link.")
+
+        if tab_open(import_tab):
+            with import_tab:
+                st.subheader(f"📥 Bulk Import — {project_type}")
+                cfg = STREAMS[project_type]
+                kind = st.radio("Import", ["Registrations", "Marks"], horizontal=True, key="import_kind")
+                template = REGISTRATION_COLUMNS[project_type] if kind == "Registrations" else marks_template(project_type)
+                st.caption(f"Upload a .csv or .xlsx file with the columns: {', '.join(template)}.")
+                st.download_button("⬇️ Template (CSV)", ",".join(template) + "\n", file_name=f"{kind.lower()}_template.csv", mime="text/csv")
+                # A new uploader key after each import clears the file, so it can't be committed twice
+                if 'import_round' not in st.session_state: st.session_state.import_round = 0
+                upload = st.file_uploader("Class list / mark sheet", type=["csv", "xlsx"], key=f"import_file_{st.session_state.import_round}")
+                if upload is not None:
+                    try:
+                        rows = read_upload(upload)
+                    except Exception as exc:
+                        st.error(f"Could not read {upload.name}: {exc}")
+                        rows = None
+                    if rows is not None:
+                        ws = cfg["registry"] if kind == "Registrations" else cfg["marks"]
+                        writable(ws)
+                        if kind == "Registrations":
+                            accepted, errors = validate_registrations(rows, project_type, load_data(cfg["registry"]))
+                        else:
+                            accepted, errors = validate_marks(rows, project_type, load_data(cfg["registry"]))
+                        c1, c2 = st.columns(2)
+                        c1.metric("Valid Rows", len(accepted))
+                        c2.metric("Rows With Errors", errors.loc[errors["row"] > 1, "row"].nunique() if not errors.empty else 0)
+                        if not errors.empty:
+                            st.write("**Errors** (spreadsheet row numbers, header = row 1)")
+                            st.dataframe(errors, hide_index=True, use_container_width=True)
+                        if not accepted.empty:
+                            with st.expander(f"Preview of {len(accepted)} valid row(s)"):
+                                st.dataframe(accepted, hide_index=True, use_container_width=True)
+                            if st.button(f"Import {len(accepted)} valid row(s) into {ws}", type="primary"):
+                                # One batched append for the whole file
+                                append_data(ws, accepted)
+                                st.session_state.import_round += 1
+                                st.success(f"Imported {len(accepted)} row(s) into {ws}.")
+
+        if tab_open(diag_tab):
+            with diag_tab:
+                diag_pwd = get_setting("diagnostics_password", "")
+                if diag_pwd and st.text_input("Diagnostics Password", type="password", key="diag_pwd") != diag_pwd:
+                    st.info("Enter the diagnostics password to view performance data.")
+                else:
+                    events = metrics.frame()
+                    reruns = events[events["kind"] == "rerun"]
+                    sheet_ops = events[events["kind"] == "sheet"]
+                    lookups = store.cache.hits + store.cache.misses
+                    c1, c2, c3, c4 = st.columns(4)
+                    c1.metric("Reruns", len(reruns))
+                    c2.metric("Rerun p95", f"{reruns['ms'].quantile(0.95):.0f} ms" if not reruns.empty else "–")
+                    c3.metric("Sheet Calls", len(sheet_ops), delta=f"{int((~sheet_ops['ok'].astype(bool)).sum())} failed", delta_color="inverse")
+                    c4.metric("Cache Hit Ratio", f"{store.cache.hits / lookups:.0%}" if lookups else "–")
+                    shared = f" ({store.cache.shared_hits} from the shared cache)" if hasattr(store.cache, "shared_hits") else ""
+                    st.caption(f"Last {len(events)} events in this server process · cache {store.cache.hits} hits{shared} / {store.cache.misses} misses")
+                    throttle = store.backend.stats() if hasattr(store.backend, "stats") else None
+                    if throttle:
+                        st.caption(f"Sheets API: {throttle['waiting']} waiting · {throttle['in_flight']} in flight · "
+                                   f"{throttle['coalesced']} reads coalesced · {throttle['throttled']} throttled "
+                                   f"({throttle['throttled_seconds']:.1f} s) · {throttle['quota_errors']} quota errors, "
+                                   f"{throttle['retries']} retried · {store.pending_count()} writes queued")
+
+                    st.write("**Latency Histogram**")
+                    ops = metrics.summary()
+                    choices = ["rerun"] + [f"{k}: {n}" for k, n in ops[["kind", "name"]].drop_duplicates().itertuples(index=False) if k != "rerun"]
+                    choice = st.selectbox("Operation", choices, key="diag_op")
+                    kind, _, name = choice.partition(": ")
+                    st.bar_chart(metrics.histogram(kind, name or None))
+
+                    st.write("**By Operation & Worksheet**")
+                    st.dataframe(ops, hide_index=True, use_container_width=True)
+
+                    d1, d2, d3 = st.columns(3)
+                    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+                    d1.download_button("⬇️ Trace (JSON)", metrics.to_json(cache={"hits": store.cache.hits, "misses": store.cache.misses},
+                                                                        pending_writes=store.pending_count(), throttle=throttle),
+                                       file_name=f"portal-trace-{stamp}.json", mime="application/json", use_container_width=True)
+                    d2.download_button("⬇️ Trace (CSV)", metrics.to_csv(), file_name=f"portal-trace-{stamp}.csv",
+                                       mime="text/csv", use_container_width=True)
+                    if d3.button("Clear Trace", use_container_width=True):
+                        metrics.clear()
+                        st.rerun()
+# --- ROLE: PROJECT SUGGESTIONS ---
+elif role == "Project Suggestions":
+    st.header(f"🔭 Available {project_type} Suggestions")
+    suggestion_browser(project_type)
+
+# --- ROLE: RESOURCES ---
+elif role == "Resources":
+    st.header(f"📚 {project_type} Resources")
+    resource_browser(project_type)
+
+# --- INSTRUMENTATION ---
+show_offline_notice()
+metrics.record("rerun", role, time.perf_counter() - rerun_started)
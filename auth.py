@@ -0,0 +1,84 @@
+import hmac
+import threading
+import time
+from collections import deque
+
+
+class CredentialIndex:
+    """Examiner accounts keyed by username, built from the users worksheet.
+
+    Meant as the ``build`` of ``Storage.index`` so it is rebuilt only when the
+    worksheet changes; a login is then one dictionary lookup and a constant-time
+    hash comparison.
+    """
+
+    def __init__(self, frame, column="username"):
+        self.accounts = {}
+        if frame.empty or column not in frame.columns or "password" not in frame.columns:
+            return
+        users = frame.reindex(columns=["full_name", column, "password", "email"]).astype(object)
+        users = users.where(users.notna(), "")
+        for full_name, username, password, email in users.itertuples(index=False, name=None):
+            username = str(username).strip()
+            if username:
+                # Duplicate usernames in the sheet keep every password, as the old row filter did
+                self.accounts.setdefault(username, []).append(
+                    (str(password), {"full_name": full_name, "username": username, "email": email}))
+
+    def __contains__(self, username):
+        return str(username).strip() in self.accounts
+
+    def verify(self, username, password_hash):
+        """The account's details if ``password_hash`` matches, else None."""
+        for stored, account in self.accounts.get(str(username).strip(), []):
+            if hmac.compare_digest(stored.encode(), password_hash.encode()):
+                return account
+        return None
+
+
+class LoginThrottle:
+    """Per-username limit on failed logins: after ``max_attempts`` failures
+    within ``window`` seconds the username is locked for ``lockout`` seconds.
+    Usernames are stripped as ``CredentialIndex`` does, so every spelling that
+    reaches the same account counts against the same limit."""
+
+    def __init__(self, max_attempts=5, window=300.0, lockout=300.0):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.lockout = lockout
+        self.blocked_attempts = 0
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._locked_until = {}
+
+    def retry_after(self, username):
+        """Seconds until ``username`` may try again (0 if it may now)."""
+        username = str(username).strip()
+        with self._lock:
+            wait = self._locked_until.get(username, 0) - time.monotonic()
+            if wait > 0:
+                self.blocked_attempts += 1
+                return wait
+            self._locked_until.pop(username, None)
+            return 0
+
+    def failure(self, username):
+        username = str(username).strip()
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) > 10000:
+                # Forget usernames whose failures have all expired
+                self._failures = {u: f for u, f in self._failures.items() if f and now - f[-1] <= self.window}
+            failures = self._failures.setdefault(username, deque())
+            failures.append(now)
+            while failures and now - failures[0] > self.window:
+                failures.popleft()
+            if len(failures) >= self.max_attempts:
+                self._locked_until[username] = now + self.lockout
+                failures.clear()
+
+    def success(self, username):
+        username = str(username).strip()
+        with self._lock:
+            self._failures.pop(username, None)
+            self._locked_until.pop(username, None)
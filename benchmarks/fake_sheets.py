@@ -0,0 +1,132 @@
+"""In-memory stand-in for ``st.connection("gsheets")`` used by the benchmarks."""
+import re
+import threading
+import time
+
+import pandas as pd
+from streamlit.connections import BaseConnection
+
+SHEETS = {}
+COUNTS = {"reads": 0, "writes": 0, "rows_read": 0, "rows_written": 0}
+LATENCY = {"seconds": 0.0}
+_lock = threading.Lock()
+# Cells the API treats as dates (the portal writes timestamps this way)
+DATE_TIME = re.compile(r"\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?$")
+
+
+def reset(sheets=None, latency=0.0):
+    with _lock:
+        SHEETS.clear()
+        SHEETS.update({k: v.copy() for k, v in (sheets or {}).items()})
+        for k in COUNTS:
+            COUNTS[k] = 0
+        LATENCY["seconds"] = latency
+
+
+def counts():
+    with _lock:
+        return dict(COUNTS)
+
+
+def _round_trip():
+    if LATENCY["seconds"]:
+        time.sleep(LATENCY["seconds"])
+
+
+def _serial(value):
+    """A date cell the way the API renders it unless asked for FORMATTED_STRING:
+    days since 1899-12-30."""
+    if isinstance(value, str) and DATE_TIME.match(value):
+        return (pd.Timestamp(value) - pd.Timestamp("1899-12-30")) / pd.Timedelta(days=1)
+    return value
+
+
+class FakeWorksheet:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def col_count(self):
+        return max(26, len(SHEETS.get(self.name, pd.DataFrame()).columns))
+
+    def row_values(self, row):
+        return [str(c) for c in SHEETS.get(self.name, pd.DataFrame()).columns]
+
+    def add_cols(self, cols):
+        pass
+
+    def get(self, range_name, value_render_option=None, date_time_render_option=None):
+        """Cells of an ``A<row>:<col>`` range, as lists of row values; blank rows
+        come back as empty lists, as from the API."""
+        _round_trip()
+        start = int(re.match(r"A(\d+):", range_name).group(1))
+        with _lock:
+            tail = SHEETS.get(self.name, pd.DataFrame()).iloc[start - 2:]
+            COUNTS["reads"] += 1
+            COUNTS["rows_read"] += len(tail)
+        values = tail.astype(object).where(tail.notna(), "").values.tolist()
+        if date_time_render_option != "FORMATTED_STRING":
+            values = [[_serial(v) for v in row] for row in values]
+        return [row if any(v != "" for v in row) else [] for row in values]
+
+    def update(self, range_name=None, values=None, **kwargs):
+        with _lock:
+            df = SHEETS.get(self.name, pd.DataFrame())
+            for c in values[0]:
+                if c not in df.columns:
+                    df[c] = ""
+            SHEETS[self.name] = df
+
+    def append_rows(self, values, value_input_option=None, insert_data_option=None, table_range=None):
+        _round_trip()
+        with _lock:
+            df = SHEETS.get(self.name)
+            first = len(df) + 2 if df is not None and len(df.columns) else 1
+            if df is None or len(df.columns) == 0:
+                df, values = pd.DataFrame(columns=values[0]), values[1:]
+            new = pd.DataFrame(values, columns=list(df.columns))
+            SHEETS[self.name] = pd.concat([df, new], ignore_index=True) if len(df) else new
+            COUNTS["writes"] += 1
+            COUNTS["rows_written"] += len(values)
+            last = len(SHEETS[self.name]) + 1
+        # Like the values.append response gspread returns
+        return {"updates": {"updatedRange": f"'{self.name}'!A{first}:Z{last}", "updatedRows": last - first + 1}}
+
+
+class FakeClient:
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        return FakeWorksheet(worksheet)
+
+
+class FakeSheetsConnection(BaseConnection):
+    """Implements the parts of GSheetsConnection the portal uses, over ``SHEETS``."""
+
+    def _connect(self, **kwargs):
+        return FakeClient()
+
+    @property
+    def client(self):
+        return self._instance
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        _round_trip()
+        with _lock:
+            df = SHEETS.get(worksheet, pd.DataFrame()).copy()
+            COUNTS["reads"] += 1
+            COUNTS["rows_read"] += len(df)
+        # Like gspread_dataframe, drop blank rows but keep numbering the others by sheet row
+        return df[~(df.isna() | (df.astype(object) == "")).all(axis=1)] if len(df.columns) else df
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        _round_trip()
+        with _lock:
+            SHEETS[worksheet] = pd.DataFrame(data).copy()
+            COUNTS["writes"] += 1
+            COUNTS["rows_written"] += len(SHEETS[worksheet])
+        return data
+
+
+def install():
+    """Make ``st.connection("gsheets", type=GSheetsConnection)`` in app.py return the fake."""
+    import streamlit_gsheets
+    streamlit_gsheets.GSheetsConnection = FakeSheetsConnection
@@ -0,0 +1,227 @@
+"""Benchmarks for the portal's hot paths on synthetic cohorts.
+
+Runs the data layer (storage, indexes, grading) directly and the Streamlit pages
+headlessly through AppTest, both against an in-memory fake of the Google Sheets
+connection, and reports latency percentiles, sheet reads/writes per operation
+and peak traced memory. Run from the repository root:
+
+    python -m benchmarks.run --sizes 100 1000 10000 50000 --repeat 20
+    python -m benchmarks.run --sizes 5000 --latency-ms 300 --json bench.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import fake_sheets
+from benchmarks.synthetic import make_cohort
+from grading import GradeSheet, ScoreTable
+from storage import GSheetsBackend, Storage, WorksheetCache, normalise_frame
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def measure(op, size, fn, repeat, setup=None):
+    """Time ``fn`` ``repeat`` times (``setup`` runs untimed before each call), then
+    once more under tracemalloc for its peak allocation."""
+    times, reads, writes, rows_read = [], 0, 0, 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        before = fake_sheets.counts()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        after = fake_sheets.counts()
+        reads += after["reads"] - before["reads"]
+        writes += after["writes"] - before["writes"]
+        rows_read += after["rows_read"] - before["rows_read"]
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    ms = np.array(times) * 1000
+    return {
+        "op": op, "rows": size, "n": repeat,
+        "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max()),
+        "reads_per_op": reads / repeat, "writes_per_op": writes / repeat, "rows_read_per_op": rows_read / repeat,
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def bench_data_layer(size, cohort, repeat):
+    results = []
+    rng = np.random.default_rng(1)
+    conn = fake_sheets.FakeSheetsConnection("bench")
+    store = Storage(GSheetsBackend(conn), WorksheetCache(), normalise=normalise_frame)
+    ids = cohort["students"]["student_id"].to_numpy()
+    marks = normalise_frame(cohort["marks"].copy())
+
+    results.append(measure("load_data (cold)", size, lambda: store.load("marks"), repeat, setup=store.cache.clear))
+    store.load("marks")
+    results.append(measure("load_data (cached)", size, lambda: store.load("marks"), repeat))
+    results.append(measure("index build students.student_id", size,
+                           lambda: store.index("students", "student_id"), repeat, setup=store.cache.clear))
+    store.index("students", "student_id")
+    results.append(measure("find student (indexed)", size,
+                           lambda: store.find("students", student_id=rng.choice(ids)), repeat))
+    results.append(measure("scores table build", size, lambda: ScoreTable(marks, "Research Project"), repeat))
+    table = ScoreTable(marks, "Research Project")
+    results.append(measure("scores lookup", size, lambda: table.lookup(rng.choice(ids)), repeat))
+
+    # The grade sheet follows the marks sheet's change feed, as on the coordinator tab
+    sheet = {}
+    n = len(marks)
+
+    def fresh_sheet():
+        sheet["s"] = GradeSheet("Research Project")
+
+    results.append(measure("coordinator grade sheet (full)", size,
+                           lambda: sheet["s"].sync(lambda cursor: (marks, (1, n), True)), repeat, setup=fresh_sheet))
+
+    def primed_sheet():
+        fresh_sheet()
+        sheet["s"].sync(lambda cursor: (marks, (1, n), True))
+
+    results.append(measure("coordinator grade sheet (+1 row)", size,
+                           lambda: sheet["s"].sync(lambda cursor: (marks.tail(1), (1, n + 1), False)), repeat,
+                           setup=primed_sheet))
+    registry = cohort["students"]
+    primed_sheet()
+    results.append(measure("coordinator merge", size,
+                           lambda: sheet["s"].table(registry, object()), repeat))
+
+    row = marks.head(1)
+    results.append(measure("append mark row", size, lambda: store.append("marks", row), repeat))
+    return results
+
+
+class Page:
+    """One headless app session, re-applying the selected tabs on every run
+    (AppTest does not send tab state back the way the browser does)."""
+
+    def __init__(self):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP, default_timeout=600)
+        self.tabs = {}
+
+    def run(self):
+        for key, label in self.tabs.items():
+            self.at.session_state[key] = label
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def sidebar(self, role, stream="Research Project"):
+        self.at.sidebar.radio[0].set_value(role)
+        self.at.sidebar.radio[1].set_value(stream)
+
+    def text(self, label):
+        return next(t for t in self.at.text_input if t.label.startswith(label))
+
+    def button(self, label):
+        return next(b for b in self.at.button if b.label.startswith(label))
+
+
+def bench_pages(size, cohort, repeat, queue_dir):
+    import streamlit as st
+    results = []
+    rng = np.random.default_rng(2)
+    ids = cohort["students"]["student_id"].to_numpy()
+
+    def cold():
+        # A restarted server: fresh process-wide resources and an empty write-behind queue. No
+        # local mirror, so first renders read the fake sheet and no background refreshes are counted
+        st.cache_resource.clear()
+        fd, path = tempfile.mkstemp(suffix=".db", dir=queue_dir)
+        os.close(fd)  # SQLite takes an empty file as a new database
+        os.environ["PORTAL_WRITE_QUEUE_PATH"] = path
+        os.environ["PORTAL_MIRROR_DIR"] = ""
+        fake_sheets.reset(cohort, fake_sheets.LATENCY["seconds"])
+
+    page = {}
+
+    def first_render():
+        page["p"] = Page()
+        page["p"].run()
+
+    results.append(measure("page: first render", size, first_render, max(1, repeat // 5), setup=cold))
+
+    p = page["p"]
+    p.tabs["registration_tabs"] = "📊 View My Scores"
+    p.run()
+
+    def view_scores():
+        p.at.text_input(key="scores_search_id").input(str(rng.choice(ids)))
+        p.run()
+
+    results.append(measure("page: view my scores", size, view_scores, repeat))
+
+    p.sidebar("Coordinator")
+    p.run()
+    p.at.sidebar.text_input[0].input("Blackberry")
+    results.append(measure("page: coordinator grades", size, p.run, repeat))
+
+    p.sidebar("Panelist / Examiner")
+    p.tabs = {}
+    p.run()
+    p.text("Username").input("examiner0")
+    p.text("Password").input("bench")
+    p.button("Login").click()
+    p.run()
+    p.run()
+
+    def submit_marks():
+        p.at.selectbox(key="sel_id").set_value(str(rng.choice(ids)))
+        p.run()
+        p.text("Initials").input("EX")
+        p.button("Submit Marks").click()
+        p.run()
+
+    results.append(measure("page: examiner submit marks", size, submit_marks, repeat))
+    p.tabs["examiner_tabs"] = "📋 My Score History"
+    results.append(measure("page: examiner history", size, p.run, repeat))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="marks-sheet rows per cohort")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated Sheets API round trip")
+    parser.add_argument("--skip-pages", action="store_true", help="only benchmark the data layer")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    fake_sheets.install()
+    tmp = tempfile.mkdtemp(prefix="portal-bench-")
+    os.environ.setdefault("PORTAL_STORAGE_BACKEND", "gsheets")
+
+    results = []
+    for size in args.sizes:
+        cohort = make_cohort(size)
+        fake_sheets.reset(cohort, args.latency_ms / 1000)
+        results += bench_data_layer(size, cohort, args.repeat)
+        if not args.skip_pages:
+            fake_sheets.reset(cohort, args.latency_ms / 1000)
+            results += bench_pages(size, cohort, args.repeat, tmp)
+
+    report = pd.DataFrame(results)
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.2f}".format):
+        print(report.to_string(index=False))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
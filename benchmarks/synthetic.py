@@ -0,0 +1,83 @@
+"""Synthetic cohorts shaped like the portal's worksheets."""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from grading import STREAMS, stage_names
+
+WORDS = ("solar grid sensor network model design control signal power data analysis "
+         "embedded system wireless antenna rural energy water monitoring machine learning").split()
+
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS, n))
+
+
+def _marks(rng, ids, id_col, stream, rows, examiners):
+    stages = STREAMS[stream]["stages"]
+    pick = rng.integers(0, len(ids), rows)
+    stage = rng.integers(0, len(stages), rows)
+    df = pd.DataFrame({id_col: np.asarray(ids)[pick],
+                       "assessment_type": np.asarray(stage_names(stream))[stage]})
+    n_crit = np.array([sum(1 for c in s["criteria"] if c) for s in stages])[stage]
+    crits = np.round(rng.uniform(0, 10, (rows, 5)) * 2) / 2
+    crits[np.arange(5) >= n_crit[:, None]] = 0.0
+    for i in range(5):
+        df[f"crit_{i + 1}"] = crits[:, i]
+    report = np.array(["Report" in s["stage"] for s in stages])[stage]
+    df["raw_mark"] = np.where(report, np.round(rng.uniform(30, 95, rows), 1), crits.sum(axis=1))
+    ex = rng.integers(0, len(examiners), rows)
+    df["examiner"] = [f"{examiners[i]} (EX)" for i in ex]
+    df["remarks"] = np.where(rng.random(rows) < 0.4, "Good progress, tighten the methodology.", "")
+    df["timestamp"] = "2026-05-04 10:00"
+    df["examiner_username"] = [f"examiner{i}" for i in ex]
+    return df[[id_col, "assessment_type", "raw_mark", "crit_1", "crit_2", "crit_3", "crit_4", "crit_5",
+               "examiner", "remarks", "timestamp", "examiner_username"]]
+
+
+def make_cohort(mark_rows, examiners=30, seed=0):
+    """Worksheets for a cohort whose marks sheets have ``mark_rows`` rows each
+    (about eight marks per student, three students per design group)."""
+    rng = np.random.default_rng(seed)
+    n_students = max(2, mark_rows // 8)
+    ids = [str(210000000 + i) for i in range(n_students)]
+    names = [f"Student {i}" for i in range(n_students)]
+    supervisors = [f"Dr Supervisor {i}" for i in range(40)]
+    examiner_names = [f"Dr Examiner {i}" for i in range(examiners)]
+
+    students = pd.DataFrame({
+        "student_id": ids, "student_name": names, "email": [f"s{i}@unam.na" for i in range(n_students)],
+        "supervisor": rng.choice(supervisors, n_students),
+        "research_title": [_text(rng, 6) for _ in range(n_students)],
+        "abstract": [_text(rng, 60) for _ in range(n_students)],
+    })
+    groups = [f"Design Group {i // 3}" for i in range(n_students)]
+    design_groups = pd.DataFrame({
+        "group_name": groups, "student_name": names, "student_id": ids,
+        "supervisor": [supervisors[(i // 3) % len(supervisors)] for i in range(n_students)],
+        "abstract": "Prototype of a low-cost monitoring system.",
+    })
+    users = pd.DataFrame({
+        "full_name": examiner_names, "username": [f"examiner{i}" for i in range(examiners)],
+        "password": hashlib.sha256(b"bench").hexdigest(), "email": [f"e{i}@unam.na" for i in range(examiners)],
+    })
+    n_sugg = max(10, mark_rows // 50)
+    suggestions = pd.DataFrame({
+        "type": rng.choice(list(STREAMS), n_sugg), "title": [_text(rng, 5).title() for _ in range(n_sugg)],
+        "abstract": [_text(rng, 40) for _ in range(n_sugg)], "supervisor": rng.choice(examiner_names, n_sugg),
+        "email": "sup@unam.na",
+    })
+    resources = pd.DataFrame({
+        "resource_name": [f"Template {i}" for i in range(20)], "stream": rng.choice(list(STREAMS), 20),
+        "download_link": "https://drive.google.com/",
+    })
+    return {
+        "students": students,
+        "design_groups": design_groups,
+        "marks": _marks(rng, ids, "student_id", "Research Project", mark_rows, examiner_names),
+        "design_marks": _marks(rng, sorted(set(groups)), "group_name", "Design Project", mark_rows, examiner_names),
+        "users": users,
+        "project_suggestions": suggestions,
+        "resources": resources,
+    }
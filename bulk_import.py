@@ -0,0 +1,220 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from grading import CRITERIA, STREAMS
+from storage import SCHEMAS, clean_ids
+
+MAX_ABSTRACT_WORDS = 250
+MIN_GROUP_MEMBERS = 2
+
+# Columns a bulk upload must provide, per stream and kind
+REGISTRATION_COLUMNS = {
+    "Research Project": ["student_id", "student_name", "email", "supervisor", "research_title", "abstract"],
+    "Design Project": ["group_name", "student_name", "student_id", "supervisor", "abstract"],
+}
+MARK_COLUMNS = ["assessment_type", "raw_mark"] + CRITERIA + ["examiner", "remarks"]
+
+
+def marks_template(stream):
+    return [STREAMS[stream]["id_col"]] + MARK_COLUMNS
+
+
+def read_upload(file):
+    """An uploaded .csv/.xlsx file as a frame of stripped strings ("" for blanks)."""
+    name = getattr(file, "name", "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        df = pd.read_excel(file, dtype=str, engine="openpyxl")
+    else:
+        df = pd.read_csv(file, dtype=str, skipinitialspace=True)
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    df = df.fillna("")
+    for c in df.columns:
+        df[c] = df[c].str.strip()
+    # Drop fully blank lines (trailing rows in spreadsheets)
+    return df[(df != "").any(axis=1)]
+
+
+class _Errors:
+    """Row-level validation errors, collected one vectorized rule at a time."""
+
+    def __init__(self, df):
+        self.df = df
+        self.parts = []
+
+    def add(self, mask, column, message):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            rows = self.df.index[mask]
+            msgs = message if isinstance(message, str) else np.asarray(message, dtype=object)[mask]
+            self.parts.append(pd.DataFrame({"row": rows, "column": column, "error": msgs}))
+
+    def frame(self):
+        if not self.parts:
+            return pd.DataFrame(columns=["row", "column", "error"])
+        out = pd.concat(self.parts, ignore_index=True)
+        # Spreadsheet row numbers: the header is row 1
+        out["row"] = out["row"] + 2
+        return out.sort_values(["row", "column"], kind="stable").reset_index(drop=True)
+
+    def bad_rows(self):
+        if not self.parts:
+            return np.zeros(len(self.df), dtype=bool)
+        return self.df.index.isin(pd.concat(self.parts)["row"]).astype(bool)
+
+
+def _missing_columns(df, required):
+    return [c for c in required if c not in df.columns]
+
+
+def validate_registrations(df, stream, existing):
+    """Check an uploaded class list against the rules of the registration forms.
+
+    Returns ``(accepted, errors)``: the rows that passed, laid out like the
+    registry worksheet, and one row per problem (spreadsheet row, column, error).
+    ``existing`` is the current registry; IDs already registered are rejected.
+    """
+    required = REGISTRATION_COLUMNS[stream]
+    missing = _missing_columns(df, required)
+    if missing:
+        return pd.DataFrame(columns=required), pd.DataFrame(
+            {"row": [1], "column": [", ".join(missing)], "error": ["Missing column(s) in the header row"]})
+    df = df.reset_index(drop=True)
+    df["student_id"] = clean_ids(df["student_id"])
+    errors = _Errors(df)
+    for col in required:
+        errors.add(df[col] == "", col, "Required")
+
+    words = df["abstract"].str.split().str.len().fillna(0).astype(int)
+    errors.add(words > MAX_ABSTRACT_WORDS, "abstract", "Abstract too long (" + words.astype(str) + " words)")
+
+    ids = df["student_id"]
+    errors.add((ids != "") & ids.duplicated(keep=False), "student_id", "Duplicate student ID in the file")
+    taken = existing["student_id"] if "student_id" in existing.columns else pd.Series(dtype=str)
+    errors.add(ids.isin(taken), "student_id", "Student ID already registered")
+
+    if stream == "Design Project":
+        # Every group needs at least two members between the file and the registry
+        ok = ~errors.bad_rows()
+        counts = df[ok].groupby("group_name").size()
+        if "group_name" in existing.columns:
+            counts = counts.add(existing["group_name"].value_counts(), fill_value=0)
+        small = df["group_name"].map(counts).fillna(0) < MIN_GROUP_MEMBERS
+        errors.add(ok & small.to_numpy() & (df["group_name"] != "").to_numpy(), "group_name",
+                   f"Groups need at least {MIN_GROUP_MEMBERS} members")
+
+    accepted = df[~errors.bad_rows()]
+    registry = STREAMS[stream]["registry"]
+    return accepted.reindex(columns=SCHEMAS[registry], fill_value=""), errors.frame()
+
+
+def validate_marks(df, stream, registry):
+    """Check an uploaded mark sheet against the stream's rubric.
+
+    Stages may be given by full name ("Presentation 1 (10%)") or short name
+    ("Presentation 1"). Criteria are 0-10 in steps of 0.5 and only allowed where
+    the stage's rubric defines them; a blank ``raw_mark`` is the sum of the
+    criteria, so then every criterion of the rubric must be scored (and stages
+    without one need a raw mark). Every raw mark must lie within the stage
+    maximum. Returns
+    ``(accepted, errors)`` like ``validate_registrations``.
+    """
+    id_col = STREAMS[stream]["id_col"]
+    required = [id_col, "assessment_type", "examiner"]
+    missing = _missing_columns(df, required)
+    if missing:
+        return pd.DataFrame(columns=SCHEMAS[STREAMS[stream]["marks"]]), pd.DataFrame(
+            {"row": [1], "column": [", ".join(missing)], "error": ["Missing column(s) in the header row"]})
+    df = df.reset_index(drop=True).reindex(columns=list(dict.fromkeys(list(df.columns) + [id_col] + MARK_COLUMNS)),
+                                           fill_value="")
+    if id_col == "student_id":
+        df[id_col] = clean_ids(df[id_col])
+    errors = _Errors(df)
+    for col in required:
+        errors.add(df[col] == "", col, "Required")
+
+    known = registry[id_col] if id_col in registry.columns else pd.Series(dtype=str)
+    errors.add((df[id_col] != "") & ~df[id_col].isin(known), id_col, "Not registered")
+
+    stages = STREAMS[stream]["stages"]
+    names = {s["stage"].lower(): s["stage"] for s in stages}
+    names.update({s["short"].lower(): s["stage"] for s in stages})
+    df["assessment_type"] = df["assessment_type"].str.lower().map(names).fillna(df["assessment_type"])
+    config = {s["stage"]: s for s in stages}
+    known_stage = df["assessment_type"].isin(list(config))
+    errors.add((df["assessment_type"] != "") & ~known_stage, "assessment_type", "Unknown assessment stage")
+
+    no_raw = df["raw_mark"] == ""
+    rubric = df["assessment_type"].map({s: any(c["criteria"]) for s, c in config.items()}).fillna(False).astype(bool)
+    errors.add(known_stage & no_raw & ~rubric, "raw_mark", "Required (this stage has no criteria)")
+    crit_sum = pd.Series(0.0, index=df.index)
+    for i, col in enumerate(CRITERIA):
+        text = df[col]
+        value = pd.to_numeric(text, errors="coerce")
+        allowed = df["assessment_type"].map({s: bool(c["criteria"][i]) for s, c in config.items()}).fillna(False).astype(bool)
+        errors.add((text != "") & value.isna(), col, "Not a number")
+        # Without a raw mark the criteria make up the mark, so none may be left out
+        errors.add(known_stage & no_raw & allowed & (text == ""), col, "Some criteria not scored")
+        errors.add(value.notna() & ((value < 0) | (value > 10) | (value * 2 % 1 != 0)), col,
+                   "Must be 0-10 in steps of 0.5")
+        errors.add(known_stage & ~allowed & (value.fillna(0) != 0), col, "Not part of this stage's rubric")
+        df[col] = value.where(allowed, 0.0).fillna(0.0)
+        crit_sum += df[col]
+
+    raw = pd.to_numeric(df["raw_mark"], errors="coerce")
+    errors.add((df["raw_mark"] != "") & raw.isna(), "raw_mark", "Not a number")
+    raw = raw.where(df["raw_mark"] != "", crit_sum)
+    stage_max = df["assessment_type"].map({s: float(c["max"]) for s, c in config.items()})
+    out_of_range = known_stage & ((raw < 0) | (raw > stage_max))
+    errors.add(out_of_range, "raw_mark", "Out of range (0-" + stage_max.fillna(0).astype(int).astype(str) + ")")
+    df["raw_mark"] = raw.astype(float)
+
+    df["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+    accepted = df[~errors.bad_rows()]
+    return accepted.reindex(columns=SCHEMAS[STREAMS[stream]["marks"]], fill_value=""), errors.frame()
+
+
+def grading_grid(registry, stream, stage, graded=()):
+    """Blank batch-grading grid for one stage: a row per registered student/group
+    with a column per rubric criterion of ``stage`` (just ``raw_mark`` for the
+    reports) and remarks. ``graded`` IDs are flagged as already marked."""
+    id_col = STREAMS[stream]["id_col"]
+    detail = "student_name" if stream == "Research Project" else "supervisor"
+    if registry.empty or id_col not in registry.columns:
+        return pd.DataFrame(columns=[id_col, "details", "graded"])
+    rows = registry.drop_duplicates(id_col)
+    rows = rows[rows[id_col].astype(str).str.strip() != ""]
+    config = {s["stage"]: s for s in STREAMS[stream]["stages"]}[stage]
+    scores = [c for c, label in zip(CRITERIA, config["criteria"]) if label] or ["raw_mark"]
+    grid = pd.DataFrame({
+        id_col: rows[id_col].astype(str).to_numpy(),
+        "details": rows[detail].astype(object).where(rows[detail].notna(), "").astype(str).to_numpy()
+        if detail in rows.columns else "",
+        "graded": rows[id_col].isin(list(graded)).to_numpy(),
+    })
+    for col in scores:
+        grid[col] = np.nan
+    grid["remarks"] = ""
+    return grid
+
+
+def validate_grid(grid, stream, stage, registry, examiner):
+    """Check an edited grading grid; rows with no scores entered are skipped.
+
+    Rows must pass ``validate_marks``, so every rubric criterion of the stage
+    must be scored. Returns ``(accepted, errors)``: the rows laid out like
+    the marks worksheet, and one row per problem keyed by student/group ID.
+    """
+    id_col = STREAMS[stream]["id_col"]
+    scores = [c for c in CRITERIA + ["raw_mark"] if c in grid.columns]
+    entered = grid[scores].notna().any(axis=1).to_numpy()
+    rows = grid[entered].reset_index(drop=True)
+    sheet = pd.DataFrame({id_col: rows[id_col].astype(str), "assessment_type": stage, "examiner": examiner,
+                          "remarks": rows["remarks"].fillna("").astype(str).str.strip()})
+    for col in CRITERIA + ["raw_mark"]:
+        sheet[col] = rows[col].map(lambda v: "" if pd.isna(v) else str(v)) if col in rows.columns else ""
+    # Criteria left blank are reported by validate_marks ("Some criteria not scored")
+    accepted, errors = validate_marks(sheet, stream, registry)
+    errors[id_col] = sheet[id_col].to_numpy()[errors["row"].to_numpy(dtype=int) - 2] if len(errors) else []
+    return accepted, errors[[id_col, "column", "error"]]
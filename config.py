@@ -0,0 +1,27 @@
+import os
+import streamlit as st
+
+
+def get_setting(name, default):
+    """Return a portal setting from the ``[portal]`` section of secrets.toml,
+    falling back to the ``PORTAL_<NAME>`` environment variable, then ``default``.
+    Values are coerced to the type of ``default``."""
+    value = None
+    try:
+        section = st.secrets.get("portal", {})
+        if name in section:
+            value = section[name]
+    except Exception:
+        pass
+    if value is None:
+        value = os.environ.get(f"PORTAL_{name.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    if default is not None:
+        try:
+            return type(default)(value)
+        except (TypeError, ValueError):
+            return default
+    return value
@@ -0,0 +1,105 @@
+import csv
+import io
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from grading import CRITERIA, STREAMS
+
+CHUNK_ROWS = 1000
+
+FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.zip)": ("zip", "application/zip"),
+}
+
+
+def _chunks(df, size, order=None):
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size] if order is None else df.iloc[order[start:start + size]]
+
+
+def _stage_chunks(scores, size):
+    stages = scores.stages.reset_index()
+    stages = stages.rename(columns={"assessment_type": "stage"})
+    cols = [scores.id_col, "stage", "examiners", "raw_mark", "max", "pct", "weight", "weighted"]
+    for chunk in _chunks(stages, size):
+        yield chunk[cols].rename(columns={"raw_mark": "avg_raw_mark", "pct": "avg_%"})
+
+
+def _criterion_chunks(scores, size):
+    labels = pd.DataFrame([(stage, col, label) for stage, cfg in scores.stage_config.items()
+                           for col, label in zip(CRITERIA, cfg["criteria"]) if label],
+                          columns=["stage", "crit", "criterion"])
+    stages = scores.stages.reset_index()
+    stages["stage"] = stages["assessment_type"].astype(str)
+    for chunk in _chunks(stages, size):
+        long = chunk.melt(id_vars=[scores.id_col, "stage"], value_vars=CRITERIA,
+                          var_name="crit", value_name="avg_score").dropna(subset=["avg_score"])
+        long = long.merge(labels, on=["stage", "crit"], sort=False)
+        if not long.empty:
+            yield long.sort_values([scores.id_col, "stage"], kind="stable")[[scores.id_col, "stage", "criterion", "avg_score"]]
+
+
+def grade_sheet_tables(stream, grades, scores, marks, chunk_rows=CHUNK_ROWS):
+    """The coordinator export as ``(sheet name, columns, chunks)`` triples: final
+    grades, per-stage averages, per-criterion averages and every examiner's raw
+    marks. Chunks are produced lazily, ``chunk_rows`` rows at a time, so a writer
+    never holds more than one chunk of a derived table in memory."""
+    id_col = STREAMS[stream]["id_col"]
+    mark_cols = [c for c in [id_col, "assessment_type", "examiner", "examiner_username", "raw_mark"] + CRITERIA
+                 + ["remarks", "timestamp"] if c in marks.columns]
+    order = None
+    if id_col in marks.columns and "assessment_type" in marks.columns:
+        order = np.lexsort((marks["assessment_type"].astype(str).to_numpy(), marks[id_col].astype(str).to_numpy()))
+    return [
+        ("Final Grades", list(grades.columns), _chunks(grades, chunk_rows)),
+        ("Stage Averages", [id_col, "stage", "examiners", "avg_raw_mark", "max", "avg_%", "weight", "weighted"],
+         _stage_chunks(scores, chunk_rows)),
+        ("Criterion Averages", [id_col, "stage", "criterion", "avg_score"], _criterion_chunks(scores, chunk_rows)),
+        ("Examiner Marks", mark_cols, (c[mark_cols] for c in _chunks(marks, chunk_rows, order))),
+    ]
+
+
+def write_xlsx(tables, out):
+    """Stream ``tables`` into a workbook with one worksheet each. openpyxl's
+    write-only mode flushes rows to disk as they are appended."""
+    wb = Workbook(write_only=True)
+    for name, columns, chunks in tables:
+        ws = wb.create_sheet(title=name[:31])
+        ws.append([str(c) for c in columns])
+        for chunk in chunks:
+            # Plain Python values, with blanks for missing cells
+            cells = chunk.astype(object).where(chunk.notna(), None)
+            for row in cells.to_numpy().tolist():
+                ws.append(row)
+    wb.save(out)
+
+
+def write_csv_zip(tables, out):
+    """Stream ``tables`` into a zip archive holding one CSV file each."""
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, columns, chunks in tables:
+            with zf.open(f"{name.lower().replace(' ', '_')}.csv", "w") as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                csv.writer(text).writerow(columns)
+                for chunk in chunks:
+                    chunk.to_csv(text, header=False, index=False)
+                text.flush()
+                text.detach()
+
+
+def export_grade_sheet(fmt, stream, grades, scores, marks):
+    """Write the export in ``fmt`` (a key of ``FORMATS``) to a temporary file and
+    return it rewound, ready to hand to ``st.download_button``."""
+    out = tempfile.TemporaryFile()
+    tables = grade_sheet_tables(stream, grades, scores, marks)
+    if FORMATS[fmt][0] == "xlsx":
+        write_xlsx(tables, out)
+    else:
+        write_csv_zip(tables, out)
+    out.seek(0)
+    return out
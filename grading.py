@@ -0,0 +1,295 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from storage import CRITERIA, group_positions
+
+# Assessment stages per stream, in display order. `max` is the raw mark the stage is
+# out of and `weight` its share of the final grade; `short` names the stage's column in
+# the coordinator grade sheet and `criteria` labels crit_1..crit_5.
+STREAMS = {
+    "Research Project": {
+        "marks": "marks", "registry": "students", "id_col": "student_id",
+        "stages": [
+            {"stage": "Presentation 1 (10%)", "short": "Presentation 1", "max": 50, "weight": 10,
+             "criteria": ["Problem Statement", "Literature Review", "Methodology", "Project Planning", "Technical Communication"]},
+            {"stage": "Presentation 2 (10%)", "short": "Presentation 2", "max": 20, "weight": 10,
+             "criteria": ["Progress", "Technical Communication", "", "", ""]},
+            {"stage": "Presentation 3 (20%)", "short": "Presentation 3", "max": 30, "weight": 20,
+             "criteria": ["Data Collection", "Data Analysis & Interpretation", "Technical Communication", "", ""]},
+            {"stage": "Final Research Report (60%)", "short": "Final Report", "max": 100, "weight": 60,
+             "criteria": ["", "", "", "", ""]},
+        ],
+    },
+    "Design Project": {
+        "marks": "design_marks", "registry": "design_groups", "id_col": "group_name",
+        "stages": [
+            {"stage": "Presentation 1 (10%)", "short": "Presentation 1", "max": 30, "weight": 10,
+             "criteria": ["Problem Statement & Justification", "Comparison Matrix", "Materials & Methods", "", ""]},
+            {"stage": "Presentation 2 (10%)", "short": "Presentation 2", "max": 30, "weight": 10,
+             "criteria": ["Sustainability Analysis", "Technical Comms", "Q&A Defense", "", ""]},
+            {"stage": "Presentation 3 (20%)", "short": "Presentation 3", "max": 30, "weight": 20,
+             "criteria": ["Design Approaches", "Synthesis & Results", "Prototype Functionality", "", ""]},
+            {"stage": "Final Design Report (60%)", "short": "Final Report", "max": 100, "weight": 60,
+             "criteria": ["", "", "", "", ""]},
+        ],
+    },
+}
+
+
+def stage_names(stream):
+    return [s["stage"] for s in STREAMS[stream]["stages"]]
+
+
+def letter_grade(pct):
+    return "A+" if pct >= 90 else "A" if pct >= 80 else "B" if pct >= 70 else "C" if pct >= 60 else "D" if pct >= 50 else "F"
+
+
+class ScoreTable:
+    """Stage and criterion averages, weighted contributions and grades for every
+    student/group of one stream, computed in a single groupby over its marks sheet.
+
+    ``stages`` has one row per (id, stage) in stage order with the mean raw mark,
+    mean criteria, number of examiners, percentage and weighted contribution;
+    ``totals`` has one row per id with the weighted score so far and the weight it
+    covers. ``lookup`` turns a single student/group into a dictionary hit.
+    """
+
+    def __init__(self, marks, stream):
+        cfg = STREAMS[stream]
+        self.stream = stream
+        self.id_col = cfg["id_col"]
+        self.stage_config = {s["stage"]: s for s in cfg["stages"]}
+        order = stage_names(stream)
+        cols = ["raw_mark"] + CRITERIA
+
+        if marks.empty or self.id_col not in marks.columns or "assessment_type" not in marks.columns:
+            df = pd.DataFrame(columns=[self.id_col, "assessment_type", "remarks"] + cols)
+        else:
+            df = marks[marks["assessment_type"].isin(order)].copy()
+        for c in cols:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(float) if c in df.columns else np.nan
+        df["assessment_type"] = pd.Categorical(df["assessment_type"], categories=order, ordered=True)
+
+        grouped = df.groupby([self.id_col, "assessment_type"], observed=True, sort=True)
+        stages = grouped[cols].mean()
+        stages["examiners"] = grouped.size()
+        stage_level = stages.index.get_level_values("assessment_type").astype(str)
+        stages["max"] = stage_level.map(lambda s: self.stage_config[s]["max"]).to_numpy(dtype=float)
+        stages["weight"] = stage_level.map(lambda s: self.stage_config[s]["weight"]).to_numpy(dtype=float)
+        stages["pct"] = (stages["raw_mark"] / stages["max"] * 100).round(1)
+        stages["weighted"] = (stages["raw_mark"] / stages["max"] * stages["weight"]).round(2)
+        self.stages = stages
+
+        totals = stages.groupby(level=0)[["weighted", "weight"]].sum()
+        totals["letter"] = [letter_grade(p) for p in totals["weighted"]]
+        self.totals = totals
+
+        ids = stages.index.get_level_values(0)
+        self._positions = group_positions(ids.to_numpy())
+
+        if "remarks" in df.columns:
+            text = df["remarks"].where(df["remarks"].notna(), "").astype(str)
+            keep = (text.str.strip() != "").to_numpy()
+            self._remark_text = text.to_numpy()[keep]
+            keys = [df[self.id_col].to_numpy()[keep], df["assessment_type"].astype(str).to_numpy()[keep]]
+            self._remarks = group_positions(*keys)
+        else:
+            self._remark_text, self._remarks = np.array([], dtype=object), {}
+
+    def lookup(self, entity_id):
+        """(stage rows in stage order, totals row or None) for one student/group."""
+        pos = self._positions.get(entity_id)
+        if pos is None:
+            return self.stages.iloc[0:0], None
+        return self.stages.iloc[pos], self.totals.loc[entity_id]
+
+    def remarks(self, entity_id, stage):
+        pos = self._remarks.get((entity_id, stage))
+        return [] if pos is None else self._remark_text[pos].tolist()
+
+
+class GradeSheet:
+    """Coordinator grade sheet for one stream: per-stage percentages and the weighted
+    ``FINAL_GRADE_%`` for every student/group, merged onto the registration sheet.
+
+    Keeps running sums and counts of ``raw_mark`` per (id, stage) and follows a
+    storage change feed (``sync``): rows appended since the last sync are folded
+    in and only the students/groups they touch are regraded; when the feed resets
+    (the sheet was rewritten) everything is rebuilt.
+    """
+
+    def __init__(self, stream):
+        cfg = STREAMS[stream]
+        self.stream = stream
+        self.id_col = cfg["id_col"]
+        self.stage_config = cfg["stages"]
+        self.order = stage_names(stream)
+        self.cursor = None
+        self.last_regraded = 0
+        self._lock = threading.Lock()
+        self._sums = pd.DataFrame(columns=self.order, dtype=float)
+        self._counts = pd.DataFrame(columns=self.order, dtype=float)
+        self._grades = self._grade(self._sums)
+        self._merged = None
+
+    @property
+    def empty(self):
+        """True until some marks have been folded in."""
+        return self._counts.empty
+
+    def _keyed(self, marks):
+        if marks.empty or self.id_col not in marks.columns or "assessment_type" not in marks.columns:
+            return pd.DataFrame({self.id_col: pd.Series(dtype=str), "assessment_type": pd.Series(dtype=str),
+                                 "raw_mark": pd.Series(dtype=float)})
+        return pd.DataFrame({
+            self.id_col: marks[self.id_col].astype(str).to_numpy(),
+            "assessment_type": marks["assessment_type"].astype(str).to_numpy(),
+            "raw_mark": pd.to_numeric(marks["raw_mark"], errors="coerce").astype(float).to_numpy(),
+        })
+
+    def _aggregate(self, rows):
+        rows = rows[rows["assessment_type"].isin(self.order) & rows["raw_mark"].notna()]
+        g = rows.groupby([self.id_col, "assessment_type"])["raw_mark"].agg(["sum", "count"])
+        sums = g["sum"].unstack().reindex(columns=self.order).astype(float)
+        counts = g["count"].unstack().reindex(columns=self.order).astype(float)
+        return sums, counts
+
+    def _grade(self, means):
+        out = pd.DataFrame(index=means.index)
+        wt = pd.Series(0.0, index=means.index)
+        for cfg in self.stage_config:
+            frac = means[cfg["stage"]] / cfg["max"]
+            out[f"{cfg['short']} (%)"] = (frac * 100).round(1)
+            wt += (frac * cfg["weight"]).fillna(0)
+        out["FINAL_GRADE_%"] = wt.round(1)
+        out.index.name = self.id_col
+        return out
+
+    def _fold(self, keyed):
+        """Add new marks rows to the running sums and regrade the ids they touch."""
+        sums, counts = self._aggregate(keyed)
+        new_ids = sums.index.difference(self._sums.index)
+        if len(new_ids):
+            blank = pd.DataFrame(np.nan, index=new_ids, columns=self.order)
+            self._sums = pd.concat([self._sums, blank])
+            self._counts = pd.concat([self._counts, blank])
+            self._grades = pd.concat([self._grades, self._grade(blank)])
+        ids = sums.index
+        self._sums.loc[ids] = self._sums.loc[ids].fillna(0) + sums.fillna(0)
+        self._counts.loc[ids] = self._counts.loc[ids].fillna(0) + counts.fillna(0)
+        self._grades.loc[ids] = self._grade(self._sums.loc[ids] / self._counts.loc[ids].replace(0, np.nan))
+        self.last_regraded = len(ids)
+
+    def _rebuild(self, keyed):
+        self._sums, self._counts = self._aggregate(keyed)
+        self._grades = self._grade(self._sums / self._counts.replace(0, np.nan))
+        self.last_regraded = len(self._grades)
+
+    def sync(self, feed):
+        """Apply ``feed(cursor)``, a ``Storage.changes`` call for the marks sheet:
+        fold in the rows added since the last sync, or rebuild when it resets."""
+        with self._lock:
+            rows, cursor, reset = feed(self.cursor)
+            if cursor == self.cursor and not reset:
+                return
+            if reset:
+                self._rebuild(self._keyed(rows))
+            else:
+                self._fold(self._keyed(rows))
+            self.cursor = cursor
+            self._merged = None
+
+    def table(self, registry, registry_version, pending=None, pending_key=None):
+        """The grade sheet left-joined onto ``registry``; stages nobody has been
+        marked for yet are left out. ``pending`` marks rows not yet in the sheet
+        (e.g. still in the write-behind queue) are counted for the ids they touch;
+        ``pending_key`` identifies them for the memo."""
+        with self._lock:
+            key = (self.cursor, registry_version, pending_key)
+            if self._merged is not None and self._merged[0] == key:
+                return self._merged[1]
+            grades, counts = self._grades, self._counts
+            if pending is not None and not pending.empty:
+                sums, extra = self._aggregate(self._keyed(pending))
+                ids = sums.index
+                sums = self._sums.reindex(ids).fillna(0) + sums.fillna(0)
+                counts = counts.reindex(counts.index.union(ids))
+                counts.loc[ids] = counts.loc[ids].fillna(0) + extra.fillna(0)
+                grades = grades.reindex(grades.index.union(ids))
+                grades.loc[ids] = self._grade(sums / counts.loc[ids].replace(0, np.nan))
+            marked = counts.fillna(0).sum() > 0
+            drop = [f"{cfg['short']} (%)" for cfg in self.stage_config if not marked.get(cfg["stage"], False)]
+            grades = grades.drop(columns=drop).reset_index()
+            merged = pd.merge(registry, grades, on=self.id_col, how="left")
+            cols = [c for c in grades.columns if c != self.id_col]
+            merged[cols] = merged[cols].fillna(0)
+            self._merged = (key, merged)
+            return merged
+
+
+def examiner_keys(frame, column="examiner"):
+    """Identify the examiner of each marks row: ``u:<username>``, or for rows
+    submitted before usernames were recorded ``n:<full name>``, lower-cased and
+    without the trailing "(INITIALS)"."""
+    blank = pd.Series("", index=frame.index)
+    user = frame["examiner_username"].fillna("").astype(str).str.strip() if "examiner_username" in frame.columns else blank
+    name = frame[column].fillna("").astype(str).str.replace(r"\s*\([^()]*\)\s*$", "", regex=True).str.strip().str.lower()
+    return ("u:" + user).where(user != "", "n:" + name)
+
+
+class ExaminerIndex:
+    """Row positions of each examiner's submissions in a marks sheet.
+
+    Rows are keyed on ``examiner_username``. Rows submitted before usernames were
+    recorded fall back to the examiner's full name, i.e. the ``examiner`` column
+    without its trailing "(INITIALS)", compared exactly and case-insensitively.
+    """
+
+    def __init__(self, frame, column="examiner"):
+        self.frame = frame
+        if frame.empty or column not in frame.columns:
+            self.positions = {}
+            return
+        self.positions = group_positions(examiner_keys(frame, column).to_numpy())
+
+    def rows(self, username, full_name):
+        parts = [self.positions.get(f"u:{username}") if username else None,
+                 self.positions.get(f"n:{str(full_name).strip().lower()}") if full_name else None]
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[np.sort(np.concatenate(parts))]
+
+
+class GradeBook:
+    """Process-wide memo of the per-stream ScoreTable (and anything else derived
+    from a stream's marks, see ``derived``), keyed on the marks-sheet version, and
+    of the GradeSheet following each stream's change feed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._feeds = {}
+
+    def follow(self, stream, feed):
+        """The stream's GradeSheet after applying ``feed`` (see ``GradeSheet.sync``)."""
+        with self._lock:
+            sheet = self._feeds.setdefault(stream, GradeSheet(stream))
+        sheet.sync(feed)
+        return sheet
+
+    def derived(self, kind, stream, version, build):
+        """``build()``, computed once per ``kind``, stream and marks-sheet version."""
+        with self._lock:
+            hit = self._tables.get((kind, stream))
+            if hit is not None and hit[0] == version:
+                return hit[1]
+        value = build()
+        with self._lock:
+            self._tables[(kind, stream)] = (version, value)
+        return value
+
+    def scores(self, stream, version, load_marks):
+        return self.derived("scores", stream, version, lambda: ScoreTable(load_marks(), stream))
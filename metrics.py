@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ["ts", "kind", "name", "worksheet", "ms", "rows", "bytes", "ok"]
+
+
+def frame_bytes(df):
+    """In-memory size of a DataFrame, a proxy for the payload moved to or from a sheet."""
+    try:
+        return int(df.memory_usage(index=False, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class Metrics:
+    """Rolling, process-wide record of timed events for the diagnostics tab.
+
+    Each event is one sheet read/write, computation or script rerun: its kind,
+    name, worksheet (if any), duration, rows and bytes transferred and whether it
+    succeeded. Only the last ``window`` events are kept, so memory stays bounded
+    and the summaries describe recent behaviour.
+    """
+
+    def __init__(self, window=5000):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=window)
+
+    def record(self, kind, name, seconds, worksheet="", rows=0, nbytes=0, ok=True):
+        event = (time.time(), kind, name, worksheet or "", seconds * 1000, int(rows), int(nbytes), ok)
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def timed(self, kind, name, worksheet=""):
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(kind, name, time.perf_counter() - start, worksheet, ok=ok)
+
+    def frame(self, kind=None):
+        """The retained events (optionally of one kind) as a DataFrame, oldest first."""
+        with self._lock:
+            events = list(self._events)
+        df = pd.DataFrame(events, columns=FIELDS)
+        df["ts"] = pd.to_datetime(df["ts"], unit="s")
+        return df[df["kind"] == kind] if kind is not None else df
+
+    def summary(self):
+        """Count, latency percentiles and rows/bytes per (kind, name, worksheet)."""
+        df = self.frame()
+        if df.empty:
+            return pd.DataFrame(columns=["kind", "name", "worksheet", "count", "errors", "total_ms",
+                                         "p50_ms", "p95_ms", "max_ms", "rows", "bytes"])
+        g = df.groupby(["kind", "name", "worksheet"], sort=True)
+        out = g["ms"].agg(count="size", total_ms="sum", p50_ms="median",
+                          p95_ms=lambda s: s.quantile(0.95), max_ms="max")
+        out.insert(1, "errors", g["ok"].agg(lambda s: int((~s.astype(bool)).sum())))
+        out["rows"] = g["rows"].sum()
+        out["bytes"] = g["bytes"].sum()
+        return out.round(2).reset_index()
+
+    def histogram(self, kind, name=None, bins=20):
+        """Latency histogram of the retained events of one kind (and name), as a
+        frame indexed by bucket label, ready for ``st.bar_chart``."""
+        df = self.frame(kind)
+        if name is not None:
+            df = df[df["name"] == name]
+        if df.empty:
+            return pd.DataFrame({"events": []})
+        counts, edges = np.histogram(df["ms"].to_numpy(), bins=bins)
+        # Enough decimals that narrow buckets still get distinct labels
+        decimals = max(0, int(np.ceil(-np.log10(edges[1] - edges[0]))) + 1)
+        labels = [f"{lo:,.{decimals}f}–{hi:,.{decimals}f} ms" for lo, hi in zip(edges[:-1], edges[1:])]
+        return pd.DataFrame({"events": counts}, index=pd.CategoricalIndex(labels, categories=labels, ordered=True))
+
+    def to_csv(self):
+        return self.frame().to_csv(index=False)
+
+    def to_json(self, **extra):
+        """The retained events plus ``extra`` top-level fields (e.g. cache counters)."""
+        events = json.loads(self.frame().to_json(orient="records", date_format="iso"))
+        return json.dumps({**extra, "events": events}, indent=1, default=str)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
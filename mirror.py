@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+
+class SnapshotMirror:
+    """Local Parquet copy of each worksheet, kept in ``directory``.
+
+    The copies let a restarted server render straight away and keep serving
+    reads while the backend is unreachable. ``start(sync)`` runs ``sync()`` on a
+    background thread right away and then every ``interval`` seconds; it is the
+    caller that decides what to refresh and save. A copy's age is the time since
+    it was last saved.
+    """
+
+    def __init__(self, directory, interval=60.0):
+        self.directory = directory
+        self.interval = interval
+        self.last_error = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._loaded = {}
+        self._thread = None
+
+    def _path(self, worksheet):
+        return os.path.join(self.directory, f"{worksheet}.parquet")
+
+    def save(self, worksheet, df):
+        """Replace the copy of ``worksheet`` with ``df`` (atomically, so a crash
+        never leaves a half-written file)."""
+        path = self._path(worksheet)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def synced_at(self, worksheet):
+        """When the copy of ``worksheet`` was saved (epoch seconds), or None."""
+        try:
+            return os.path.getmtime(self._path(worksheet))
+        except OSError:
+            return None
+
+    def load(self, worksheet):
+        """``(frame, synced_at)`` of the saved copy, or ``(None, None)``."""
+        synced_at = self.synced_at(worksheet)
+        if synced_at is None:
+            return None, None
+        with self._lock:
+            hit = self._loaded.get(worksheet)
+            if hit is not None and hit[1] == synced_at:
+                return hit[0].copy(deep=False), synced_at
+        try:
+            df = pd.read_parquet(self._path(worksheet))
+        except Exception:
+            return None, None
+        with self._lock:
+            self._loaded[worksheet] = (df, synced_at)
+        return df.copy(deep=False), synced_at
+
+    def start(self, sync):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(sync,), name="snapshot-mirror", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, sync):
+        while True:
+            try:
+                sync()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            time.sleep(self.interval)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from grading import CRITERIA, STREAMS, examiner_keys, stage_names
+
+SCORE_STEPS = np.arange(0, 10.5, 0.5)
+
+
+class Moderation:
+    """Examiner-moderation statistics for one stream's marks sheet.
+
+    Every mark is expressed as a percentage of its stage maximum; an examiner who
+    marked the same student/group and stage more than once counts once, with the
+    mean of their marks. Where several examiners marked the same student/group
+    and stage, each mark is compared with the mean of the *other* examiners'
+    marks (its deviation), which drives:
+
+    * ``leniency``: per examiner, the mean deviation of their marks (positive is
+      more generous than their co-examiners);
+    * ``spread``: per student/group and stage, the range and standard deviation
+      of the examiners' marks;
+    * ``outliers``: marks whose deviation is extreme for their stage, by a robust
+      z-score (median and MAD of that stage's deviations).
+
+    ``criteria`` and ``distribution`` describe the rubric criterion scores.
+    Everything is computed in a few vectorized passes when the object is built.
+    """
+
+    def __init__(self, marks, stream):
+        cfg = STREAMS[stream]
+        self.stream = stream
+        self.id_col = cfg["id_col"]
+        self.order = stage_names(stream)
+        self.stage_config = {s["stage"]: s for s in cfg["stages"]}
+
+        if marks.empty or self.id_col not in marks.columns or "assessment_type" not in marks.columns:
+            marks = pd.DataFrame(columns=[self.id_col, "assessment_type", "raw_mark", "examiner"] + CRITERIA)
+        marks = marks[marks["assessment_type"].isin(self.order)]
+        stage = marks["assessment_type"].astype(str)
+        raw = pd.to_numeric(marks["raw_mark"], errors="coerce").astype(float) if "raw_mark" in marks.columns else np.nan
+        rows = pd.DataFrame({
+            self.id_col: marks[self.id_col].astype(str).to_numpy(),
+            "stage": pd.Categorical(stage, categories=self.order, ordered=True),
+            "key": examiner_keys(marks).to_numpy() if "examiner" in marks.columns else "",
+            "examiner": marks["examiner"].astype(str).to_numpy() if "examiner" in marks.columns else "",
+            "pct": (raw / stage.map({s: float(c["max"]) for s, c in self.stage_config.items()}).astype(float) * 100).to_numpy(),
+        })
+        for c in CRITERIA:
+            rows[c] = pd.to_numeric(marks[c], errors="coerce").astype(float).to_numpy() if c in marks.columns else np.nan
+        self.rows = rows
+        # Display name of each examiner: the first way they signed a mark
+        self.names = rows.drop_duplicates("key").set_index("key")["examiner"]
+
+        # One mark per examiner per (id, stage), then leave-one-out consensus
+        per = (rows.dropna(subset=["pct"]).groupby([self.id_col, "stage", "key"], observed=True, sort=False)["pct"]
+               .mean().reset_index())
+        group = per.groupby([self.id_col, "stage"], observed=True, sort=False)["pct"]
+        total, count = group.transform("sum"), group.transform("count")
+        per["examiners"] = count
+        per["others"] = ((total - per["pct"]) / (count - 1)).where(count > 1)
+        per["deviation"] = per["pct"] - per["others"]
+        stage_dev = per.groupby("stage", observed=True)["deviation"]
+        median = stage_dev.transform("median")
+        mad = (per["deviation"] - median).abs().groupby(per["stage"], observed=True).transform("median") * 1.4826
+        per["z"] = (per["deviation"] - median) / mad.replace(0, np.nan)
+        self.per_examiner = per
+
+    def leniency(self, stage=None):
+        """Per examiner: marks, mean %, marks shared with other examiners and the
+        mean/standard deviation of their deviation from them, most lenient first."""
+        per = self.per_examiner if stage is None else self.per_examiner[self.per_examiner["stage"] == stage]
+        g = per.groupby("key", sort=False)
+        out = pd.DataFrame({
+            "marks": g.size(),
+            "mean_%": g["pct"].mean(),
+            "co_marked": g["deviation"].count(),
+            "leniency": g["deviation"].mean(),
+            "deviation_sd": g["deviation"].std(),
+        })
+        out.insert(0, "examiner", self.names.reindex(out.index).to_numpy())
+        return out.round(2).sort_values("leniency", ascending=False, na_position="last").reset_index(drop=True)
+
+    def spread(self, stage=None, threshold=15.0):
+        """Per student/group and stage marked by several examiners: their number,
+        mean, lowest, highest, range and standard deviation (all in %), widest
+        first; ``flagged`` when the range is at least ``threshold`` points."""
+        per = self.per_examiner[self.per_examiner["examiners"] > 1]
+        if stage is not None:
+            per = per[per["stage"] == stage]
+        g = per.groupby([self.id_col, "stage"], observed=True, sort=False)["pct"]
+        out = g.agg(examiners="count", mean="mean", low="min", high="max", sd="std")
+        out.insert(4, "range", out["high"] - out["low"])
+        out["flagged"] = out["range"] >= threshold
+        return out.round(2).sort_values("range", ascending=False).reset_index()
+
+    def outliers(self, stage=None, z=3.0, min_points=10.0):
+        """Marks at least ``z`` robust standard deviations and ``min_points``
+        percentage points away from the other examiners' mean."""
+        per = self.per_examiner
+        mask = (per["z"].abs() >= z) & (per["deviation"].abs() >= min_points)
+        if stage is not None:
+            mask &= per["stage"] == stage
+        out = per[mask].copy()
+        out.insert(2, "examiner", self.names.reindex(out["key"]).to_numpy())
+        out = out[[self.id_col, "stage", "examiner", "pct", "others", "deviation", "z"]]
+        return out.round(2).sort_values("z", key=np.abs, ascending=False).reset_index(drop=True)
+
+    def _criterion_scores(self):
+        """(stage, criterion label, score) for every scored rubric criterion."""
+        labels = pd.DataFrame([(stage, col, label) for stage, cfg in self.stage_config.items()
+                               for col, label in zip(CRITERIA, cfg["criteria"]) if label],
+                              columns=["stage", "crit", "criterion"])
+        long = self.rows.assign(stage=self.rows["stage"].astype(str)).melt(
+            id_vars=["stage"], value_vars=CRITERIA, var_name="crit", value_name="score").dropna(subset=["score"])
+        return long.merge(labels, on=["stage", "crit"], sort=False)
+
+    def criteria(self):
+        """Count, mean, standard deviation and quartiles of each criterion's scores
+        per stage, in rubric order."""
+        long = self._criterion_scores()
+        g = long.groupby(["stage", "crit", "criterion"], sort=False)["score"]
+        out = g.agg(count="count", mean="mean", sd="std", p25=lambda s: s.quantile(0.25),
+                    median="median", p75=lambda s: s.quantile(0.75)).reset_index()
+        out["stage"] = pd.Categorical(out["stage"], categories=self.order, ordered=True)
+        return out.sort_values(["stage", "crit"]).drop(columns="crit").round(2).reset_index(drop=True)
+
+    def distribution(self, stage):
+        """How often each score (0-10 in steps of 0.5) was given for each criterion
+        of ``stage``, as a frame indexed by score with a column per criterion."""
+        long = self._criterion_scores()
+        long = long[long["stage"] == stage]
+        labels = [label for label in self.stage_config[stage]["criteria"] if label]
+        steps = np.clip(np.round(long["score"].to_numpy() * 2).astype(int), 0, len(SCORE_STEPS) - 1)
+        which = pd.Categorical(long["criterion"], categories=labels).codes
+        counts = np.bincount(which * len(SCORE_STEPS) + steps, minlength=len(labels) * len(SCORE_STEPS))
+        return pd.DataFrame(counts.reshape(len(labels), len(SCORE_STEPS)).T,
+                            index=pd.Index(SCORE_STEPS, name="score"), columns=labels)
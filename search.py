@@ -0,0 +1,103 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from storage import group_positions
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokens(text):
+    """Lower-cased word tokens of ``text``."""
+    return TOKEN.findall(str(text).lower())
+
+
+class TextIndex:
+    """Inverted index over the ``fields`` text columns of a worksheet, for keyword
+    search within one value of ``column`` (e.g. a stream) with an optional
+    supervisor filter.
+
+    Meant as the ``build`` of ``Storage.index``, so it is rebuilt only when the
+    worksheet changes. Every query word must match, as a whole word or the start
+    of one; results keep worksheet order and are row positions, so a page of
+    them can be materialised with ``rows``.
+    """
+
+    fields = ()
+    supervisor = "supervisor"
+
+    def __init__(self, frame, column):
+        self.frame = frame
+        self.column = column
+        self.postings = {}
+        self.groups = {}
+        self.supervisors = {}
+        self.vocabulary = np.array([], dtype=object)
+        if frame.empty or column not in frame.columns:
+            return
+        self.groups = group_positions(frame[column].astype(object).where(frame[column].notna()).to_numpy())
+        if self.supervisor in frame.columns:
+            names = frame[self.supervisor].astype(object).where(frame[self.supervisor].notna(), "").astype(str).str.strip()
+            self.supervisors = group_positions(frame[column].astype(object).to_numpy(), names.mask(names == "").to_numpy())
+
+        fields = [f for f in self.fields if f in frame.columns]
+        if not fields:
+            return
+        text = frame[fields].astype(object).where(frame[fields].notna(), "").astype(str)
+        text = text[fields[0]].str.cat([text[f] for f in fields[1:]], sep=" ") if len(fields) > 1 else text[fields[0]]
+        found = text.str.lower().str.findall(TOKEN.pattern).to_numpy()
+        lengths = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+        if not lengths.sum():
+            return
+        codes, words = pd.factorize(np.fromiter((w for ws in found for w in ws), dtype=object, count=int(lengths.sum())))
+        # One key per (word, row): unique sorts them by word, then row position
+        keys = np.unique(codes.astype(np.int64) * len(frame) + np.repeat(np.arange(len(frame)), lengths))
+        word, row = np.divmod(keys, len(frame))
+        starts = np.flatnonzero(np.r_[True, word[1:] != word[:-1]])
+        self.postings = dict(zip(np.asarray(words, dtype=object)[word[starts]].tolist(), np.split(row, starts[1:])))
+        self.vocabulary = np.array(sorted(self.postings), dtype=object)
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    def supervisor_names(self, group):
+        """Sorted supervisor names that occur within ``group``."""
+        return sorted(name for g, name in self.supervisors if g == group)
+
+    def _word(self, word):
+        """Positions of rows containing a word starting with ``word``."""
+        lo = np.searchsorted(self.vocabulary, word, side="left")
+        hi = np.searchsorted(self.vocabulary, word + "\uffff", side="left")
+        if lo == hi:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate([self.postings[w] for w in self.vocabulary[lo:hi]]))
+
+    def search(self, query="", group=None, supervisor=None):
+        """Sorted positions of the rows in ``group`` (by ``supervisor``, if given)
+        matching every word of ``query``."""
+        if group is not None:
+            hits = self.groups.get(group, np.array([], dtype=np.int64))
+        else:
+            hits = np.arange(len(self.frame))
+        if supervisor:
+            by = [p for (g, name), p in self.supervisors.items() if name == supervisor and group in (None, g)]
+            hits = np.intersect1d(hits, np.concatenate(by) if by else np.array([], dtype=np.int64))
+        for word in dict.fromkeys(tokens(query)):
+            if not len(hits):
+                break
+            hits = np.intersect1d(hits, self._word(word))
+        return np.sort(hits)
+
+    def rows(self, positions):
+        return self.frame.iloc[positions]
+
+
+class SuggestionIndex(TextIndex):
+    fields = ("title", "abstract", "supervisor")
+
+
+class ResourceIndex(TextIndex):
+    fields = ("resource_name",)
+    supervisor = None
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import pyarrow.feather as feather
+
+# One worksheet's entry in the snapshot index. ``version`` changes whenever the
+# worksheet's content does, ``revision`` on every publish (for compare-and-set),
+# ``epoch`` when it is rewritten rather than appended to. ``file`` is None when
+# there is no usable snapshot, e.g. after a write that wasn't published.
+Snapshot = namedtuple("Snapshot", "version revision epoch etag rows fetched_at file")
+
+
+class SnapshotStore:
+    """Latest snapshot of each worksheet, shared by every server process on a host.
+
+    Frames are written once as uncompressed Arrow files in ``directory`` and read
+    back memory-mapped, so numeric columns are not copied. A small SQLite index
+    holds each worksheet's version, epoch and current file; a process publishes
+    a new snapshot only if nobody else has since the one it started from, and
+    ``invalidate`` makes every process fetch the worksheet again. ``lease`` lets
+    one process refresh a worksheet while the others wait for its snapshot.
+    """
+
+    def __init__(self, directory, lease_seconds=30.0):
+        self.directory = directory
+        self.lease_seconds = lease_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "snapshots.db"), check_same_thread=False,
+                                   timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS snapshots (worksheet TEXT PRIMARY KEY, "
+                         "version INTEGER NOT NULL, revision INTEGER NOT NULL, epoch INTEGER NOT NULL, "
+                         "etag TEXT, rows INTEGER NOT NULL DEFAULT 0, fetched_at REAL NOT NULL DEFAULT 0, "
+                         "file TEXT, lease_until REAL NOT NULL DEFAULT 0)")
+
+    def _record(self, worksheet):
+        row = self._db.execute("SELECT version, revision, epoch, etag, rows, fetched_at, file FROM snapshots "
+                               "WHERE worksheet = ?", (worksheet,)).fetchone()
+        return Snapshot(*row) if row is not None else None
+
+    def record(self, worksheet):
+        """The worksheet's current ``Snapshot``, or None if no process has seen it."""
+        with self._lock:
+            return self._record(worksheet)
+
+    def version(self, worksheet):
+        rec = self.record(worksheet)
+        return rec.version if rec is not None else 0
+
+    def read(self, rec):
+        """The frame of ``rec``, or None if its file is gone (a newer snapshot replaced it)."""
+        if rec is None or rec.file is None:
+            return None
+        try:
+            return feather.read_table(os.path.join(self.directory, rec.file), memory_map=True).to_pandas()
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, name):
+        if name is not None:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _swap(self, worksheet, expect, fields):
+        """Update the worksheet's row if its revision is still ``expect`` (None: any);
+        returns the new record and the file it replaced, or None."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            current = self._record(worksheet)
+            if expect is not None and (current.revision if current is not None else 0) != expect:
+                self._db.execute("ROLLBACK")
+                return None
+            old = current._asdict() if current is not None else dict(version=0, revision=0, epoch=0, etag=None,
+                                                                       rows=0, fetched_at=0.0, file=None)
+            new = {**old, **fields(old), "revision": old["revision"] + 1}
+            self._db.execute("INSERT INTO snapshots (worksheet, version, revision, epoch, etag, rows, fetched_at, file) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(worksheet) DO UPDATE SET "
+                             "version = excluded.version, revision = excluded.revision, epoch = excluded.epoch, "
+                             "etag = excluded.etag, rows = excluded.rows, fetched_at = excluded.fetched_at, "
+                             "file = excluded.file",
+                             (worksheet, new["version"], new["revision"], new["epoch"], new["etag"], new["rows"],
+                              new["fetched_at"], new["file"]))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return Snapshot(**new), old["file"]
+
+    def publish(self, worksheet, df, etag, epoch, fetched_at, expect):
+        """Make ``df`` the worksheet's snapshot, unless another process has published
+        or invalidated since revision ``expect``. Returns the new record or None."""
+        name = f"{worksheet}-{uuid.uuid4().hex}.arrow"
+        path = os.path.join(self.directory, name)
+        try:
+            feather.write_feather(df.reset_index(drop=True), path, compression="uncompressed")
+        except Exception:
+            # Columns Arrow can't type (e.g. mixed objects) just aren't shared
+            self._remove(name)
+            self.invalidate(worksheet)
+            return None
+        def fields(old):
+            changed = etag is None or etag != old["etag"] or old["file"] is None
+            return dict(version=old["version"] + changed, epoch=epoch, etag=etag, rows=len(df),
+                        fetched_at=fetched_at, file=name)
+        with self._lock:
+            swapped = self._swap(worksheet, expect, fields)
+        if swapped is None:
+            self._remove(name)
+            return None
+        rec, old_file = swapped
+        # Processes still mapping the old file keep their view (it is only unlinked)
+        self._remove(old_file)
+        return rec
+
+    def invalidate(self, worksheet):
+        """Drop the worksheet's snapshot after a write, in every process."""
+        with self._lock:
+            rec, old_file = self._swap(worksheet, None, lambda old: dict(
+                version=old["version"] + 1, epoch=old["epoch"] + 1, etag=None, rows=0, file=None))
+        self._remove(old_file)
+        return rec
+
+    def lease(self, worksheet):
+        """Claim the right to refresh ``worksheet`` for ``lease_seconds``; False
+        while another process holds it."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO snapshots (worksheet, version, revision, epoch) VALUES (?, 0, 0, 0)",
+                             (worksheet,))
+            cur = self._db.execute("UPDATE snapshots SET lease_until = ? WHERE worksheet = ? AND lease_until < ?",
+                                   (now + self.lease_seconds, worksheet, now))
+            return cur.rowcount == 1
+
+    def release(self, worksheet):
+        with self._lock:
+            self._db.execute("UPDATE snapshots SET lease_until = 0 WHERE worksheet = ?", (worksheet,))
+
+    def wait(self, worksheet, revision, timeout=None):
+        """Wait until the worksheet's revision moves past ``revision`` or its lease
+        runs out; returns the latest record."""
+        deadline = time.monotonic() + (self.lease_seconds if timeout is None else timeout)
+        while True:
+            with self._lock:
+                rec = self._record(worksheet)
+                leased = self._db.execute("SELECT lease_until FROM snapshots WHERE worksheet = ?",
+                                          (worksheet,)).fetchone()
+            if rec is None or rec.revision != revision or not leased or leased[0] < time.time() \
+                    or time.monotonic() >= deadline:
+                return rec
+            time.sleep(0.1)
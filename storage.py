@@ -0,0 +1,968 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import Metrics, frame_bytes
+from mirror import SnapshotMirror
+from write_queue import WriteBehindQueue
+
+
+try:
+    # Arrow-backed strings with NaN for missing values (the default str dtype in pandas 3)
+    STRING = pd.StringDtype(na_value=np.nan)
+except TypeError:  # pandas < 2.3
+    STRING = object
+
+
+def clean_id(val):
+    if pd.isna(val) or val == "": return ""
+    return str(val).split('.')[0].strip()
+
+
+def clean_ids(values):
+    """``clean_id`` over a whole Series with vectorized string operations."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        # IDs the sheet parsed as numbers, e.g. 2101.0
+        return pd.Series(np.trunc(values), index=values.index).astype("Int64").astype(STRING).fillna("")
+    return values.astype(STRING).str.replace(r"(?s)\..*", "", regex=True).str.strip().fillna("")
+
+
+def normalise_ids(df):
+    if not df.empty and 'student_id' in df.columns:
+        df['student_id'] = clean_ids(df['student_id'])
+    return df
+
+
+def group_positions(*keys):
+    """Map each distinct key (a tuple when several key arrays are given) to the
+    positions where it occurs; missing keys are skipped. Equivalent to
+    ``groupby(keys).indices`` without its per-element cost on string columns."""
+    if not len(keys[0]):
+        return {}
+    factorized = [pd.factorize(np.asarray(k, dtype=object)) for k in keys]
+    code = factorized[0][0].astype(np.int64)
+    valid = code >= 0
+    for codes, uniques in factorized[1:]:
+        valid &= codes >= 0
+        code = code * len(uniques) + codes
+    pos = np.flatnonzero(valid)
+    order = np.argsort(code[pos], kind="stable")
+    pos, sorted_code = pos[order], code[pos][order]
+    starts = np.flatnonzero(np.r_[True, sorted_code[1:] != sorted_code[:-1]])
+    rep = pos[starts]
+    labels = [np.asarray(uniques, dtype=object)[codes[rep]] for codes, uniques in factorized]
+    labels = labels[0].tolist() if len(labels) == 1 else list(zip(*(l.tolist() for l in labels)))
+    return dict(zip(labels, np.split(pos, starts[1:])))
+
+
+def frame_etag(df):
+    """Content fingerprint of a worksheet frame, or None if it cannot be hashed."""
+    try:
+        h = hashlib.sha1("\x1f".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return h.hexdigest()
+    except Exception:
+        return None
+
+
+CRITERIA = ["crit_1", "crit_2", "crit_3", "crit_4", "crit_5"]
+MARK_COLUMNS = ["assessment_type", "raw_mark"] + CRITERIA + ["examiner", "remarks", "timestamp", "examiner_username"]
+
+# Columns each worksheet starts with, and the columns looked up by equality.
+SCHEMAS = {
+    "students": ["student_id", "student_name", "email", "supervisor", "research_title", "abstract"],
+    "design_groups": ["group_name", "student_name", "student_id", "supervisor", "abstract"],
+    "marks": ["student_id"] + MARK_COLUMNS,
+    "design_marks": ["group_name"] + MARK_COLUMNS,
+    "users": ["full_name", "username", "password", "email"],
+    "project_suggestions": ["type", "title", "abstract", "supervisor", "email"],
+    "resources": ["resource_name", "stream", "download_link"],
+}
+INDEXES = {
+    "students": ["student_id"],
+    "design_groups": ["student_id", "group_name"],
+    "marks": ["student_id", "examiner_username", "assessment_type"],
+    "design_marks": ["group_name", "examiner_username", "assessment_type"],
+    "users": ["username"],
+    "project_suggestions": ["type"],
+    "resources": ["stream"],
+}
+NUMERIC_COLUMNS = {"raw_mark"} | set(CRITERIA)
+# In-memory dtypes: few distinct labels repeated down the sheet become categoricals,
+# marks float32, IDs and free text strings.
+CATEGORY_COLUMNS = {"assessment_type", "examiner", "examiner_username", "supervisor", "type", "stream"}
+ID_COLUMNS = {"student_id", "group_name"}
+
+
+def normalise_frame(df):
+    """Schema-aware typing of a worksheet read from the backend: cleaned IDs and
+    compact dtypes (see ``CATEGORY_COLUMNS``, ``NUMERIC_COLUMNS``, ``ID_COLUMNS``).
+    Blank labels become "" rather than missing, so categoricals never hold NaN."""
+    if df.empty:
+        return df
+    df = normalise_ids(df)
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype(STRING).fillna("").astype("category")
+        elif col in ID_COLUMNS and col != "student_id":
+            df[col] = df[col].astype(STRING).fillna("")
+        elif df[col].dtype == object:
+            df[col] = df[col].astype(STRING)
+    return df
+
+
+def _cell(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, np.floating) and value.dtype.itemsize < 8:
+        # Shortest decimal form, so 64.6 stored as float32 is written back as 64.6
+        return float(str(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def frame_to_rows(df, header):
+    """Lay ``df`` out as lists of cell values in ``header`` column order."""
+    cols = [df[c] if c in df.columns else None for c in header]
+    return [[_cell(col.iat[i]) if col is not None else "" for col in cols] for i in range(len(df))]
+
+
+class GSheetsBackend:
+    """Worksheet storage on the Google Sheet behind ``st.connection("gsheets")``."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        # Full reads drop blank rows, so a frame can be shorter than the sheet rows
+        # it came from: {worksheet: {frame rows: sheet data rows}} as last seen
+        self._extents = {}
+
+    def _note(self, worksheet, rows, extent, reset=False):
+        with self._lock:
+            known = {} if reset else self._extents.get(worksheet, {})
+            known.pop(rows, None)
+            known[rows] = extent
+            self._extents[worksheet] = dict(list(known.items())[-8:])
+
+    def _offset(self, worksheet):
+        """Blank rows above the latest known end of the data (0 if none known)."""
+        known = self._extents.get(worksheet)
+        if not known:
+            return 0
+        rows, extent = next(reversed(known.items()))
+        return extent - rows
+
+    def _extent(self, worksheet, rows):
+        """Sheet data rows spanned by the first ``rows`` rows of a full read."""
+        with self._lock:
+            known = self._extents.get(worksheet, {})
+            return known[rows] if rows in known else rows + self._offset(worksheet)
+
+    def _rows(self, worksheet, extent):
+        """Inverse of ``_extent``."""
+        with self._lock:
+            known = self._extents.get(worksheet, {})
+            for rows, end in known.items():
+                if end == extent:
+                    return rows
+            return extent - self._offset(worksheet)
+
+    def read(self, worksheet):
+        df = self.conn.read(worksheet=worksheet, ttl=0)
+        # The index still numbers the sheet's data rows, with gaps where blank ones were
+        numbered = len(df) and pd.api.types.is_integer_dtype(df.index)
+        self._note(worksheet, len(df), int(df.index[-1]) + 1 if numbered else len(df), reset=True)
+        return df
+
+    def replace(self, worksheet, df):
+        """Overwrite the whole worksheet with ``df``."""
+        self.conn.update(worksheet=worksheet, data=df)
+        self._note(worksheet, len(df), len(df), reset=True)
+
+    def read_since(self, worksheet, start, columns):
+        """Data rows after the first ``start``, laid out in ``columns``, read as one
+        range with a spare column to notice a grown header. None when rows use
+        columns beyond ``columns``, i.e. the whole worksheet must be re-read.
+        Values are rendered the way full reads render them, and blank rows are
+        skipped like full reads skip them."""
+        ws = self.conn.client._select_worksheet(worksheet=worksheet)
+        width = len(columns) + 1
+        first = self._extent(worksheet, start)
+        values = ws.get(f"A{first + 2}:{_column_letter(width)}", value_render_option="UNFORMATTED_VALUE",
+                        date_time_render_option="FORMATTED_STRING")
+        rows = [list(r) + [""] * (width - len(r)) for r in values]
+        if any(r[-1] != "" for r in rows):
+            return None
+        kept = [r[:-1] for r in rows if any(v != "" for v in r)]
+        self._note(worksheet, start + len(kept), first + len(rows))
+        df = pd.DataFrame(kept, columns=list(columns))
+        return df.replace("", np.nan)
+
+    def append(self, worksheet, rows):
+        """Append ``rows`` below the existing data in a single values.append call.
+
+        Only the new rows are sent, so the cost does not grow with the sheet and
+        concurrent appends from other sessions are never overwritten. Columns the
+        sheet does not have yet are added to its header row first. Returns the
+        position (in full reads) the rows landed at, from the range the API
+        reports as updated (None if it reports none).
+        """
+        if rows.empty:
+            return None
+        ws = self.conn.client._select_worksheet(worksheet=worksheet)
+        header = [h for h in ws.row_values(1) if h != ""]
+        if not header:
+            header = [str(c) for c in rows.columns]
+            result = ws.append_rows([header] + frame_to_rows(rows, header), value_input_option="USER_ENTERED", table_range="A1")
+            first = _first_row(result)
+            return self._landed(worksheet, first - 1, len(rows)) if first is not None else None
+        missing = [str(c) for c in rows.columns if str(c) not in header]
+        if missing:
+            header = header + missing
+            if len(header) > ws.col_count:
+                ws.add_cols(len(header) - ws.col_count)
+            ws.update(range_name="A1", values=[header])
+        result = ws.append_rows(frame_to_rows(rows, header), value_input_option="USER_ENTERED",
+                                insert_data_option="INSERT_ROWS", table_range="A1")
+        first = _first_row(result)
+        return self._landed(worksheet, first - 2, len(rows)) if first is not None else None
+
+    def _landed(self, worksheet, extent, count):
+        """Frame position of ``count`` rows appended at sheet data row ``extent``."""
+        at = self._rows(worksheet, extent)
+        self._note(worksheet, at + count, extent + count)
+        return at
+
+
+def _first_row(result):
+    """Sheet row number where a values.append response says the rows went."""
+    updated = ((result or {}).get("updates") or {}).get("updatedRange", "")
+    match = re.search(r"!\$?[A-Z]+\$?(\d+)", updated)
+    return int(match.group(1)) if match else None
+
+
+def _column_letter(n):
+    """A1-notation letters of the ``n``-th (1-based) column."""
+    letters = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SQLiteBackend:
+    """Worksheet storage in a local SQLite database (WAL mode).
+
+    Each worksheet is a table with the columns from ``SCHEMAS`` plus a ``_row``
+    rowid that preserves insertion order, and secondary indexes on the columns in
+    ``INDEXES``, so ``find`` is an indexed query rather than a DataFrame scan.
+    Columns that appear later are added with ALTER TABLE on first write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            for worksheet in SCHEMAS:
+                self._ensure_table(worksheet, SCHEMAS[worksheet])
+
+    def _columns(self, worksheet):
+        rows = self._db.execute(f"PRAGMA table_info({_quote(worksheet)})").fetchall()
+        return [r[1] for r in rows if r[1] != "_row"]
+
+    def _ensure_table(self, worksheet, columns):
+        existing = self._columns(worksheet)
+        missing = [c for c in columns if c not in existing]
+        if not missing:
+            return existing
+        if not existing:
+            cols = ", ".join(f"{_quote(c)} {'REAL' if c in NUMERIC_COLUMNS else 'TEXT'}" for c in columns)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {_quote(worksheet)} (_row INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+        else:
+            for col in missing:
+                self._db.execute(f"ALTER TABLE {_quote(worksheet)} ADD COLUMN {_quote(col)} {'REAL' if col in NUMERIC_COLUMNS else 'TEXT'}")
+        existing = existing + missing
+        for col in INDEXES.get(worksheet, []):
+            if col in missing:
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'ix_{worksheet}_{col}')} ON {_quote(worksheet)} ({_quote(col)})")
+        return existing
+
+    def _select(self, worksheet, where=None):
+        columns = self._columns(worksheet)
+        if not columns:
+            return pd.DataFrame()
+        sql = f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(worksheet)}"
+        params = []
+        if where:
+            if any(col not in columns for col in where):
+                return pd.DataFrame(columns=columns)
+            sql += " WHERE " + " AND ".join(f"{_quote(col)} = ?" for col in where)
+            params = [str(v) if not isinstance(v, (int, float)) else v for v in where.values()]
+        return pd.read_sql_query(sql + " ORDER BY _row", self._db, params=params)
+
+    def _insert(self, worksheet, rows):
+        columns = self._ensure_table(worksheet, [str(c) for c in rows.columns])
+        cols = [str(c) for c in rows.columns]
+        values = [[None if v == "" and c in NUMERIC_COLUMNS else v for c, v in zip(cols, r)] for r in frame_to_rows(rows, cols)]
+        self._db.executemany(
+            f"INSERT INTO {_quote(worksheet)} ({', '.join(map(_quote, cols))}) VALUES ({', '.join('?' * len(cols))})",
+            values,
+        )
+        return columns
+
+    def read(self, worksheet):
+        with self._lock:
+            return self._select(worksheet)
+
+    def find(self, worksheet, **where):
+        """Rows of ``worksheet`` whose columns equal the given values."""
+        with self._lock:
+            return self._select(worksheet, where)
+
+    def read_since(self, worksheet, start, columns):
+        """Rows after the first ``start``; None when the table's columns are no
+        longer ``columns``."""
+        with self._lock:
+            if self._columns(worksheet) != list(columns):
+                return None
+            sql = f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(worksheet)} ORDER BY _row LIMIT -1 OFFSET ?"
+            return pd.read_sql_query(sql, self._db, params=[int(start)])
+
+    def replace(self, worksheet, df):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._ensure_table(worksheet, SCHEMAS.get(worksheet, []) + [str(c) for c in df.columns])
+                self._db.execute(f"DELETE FROM {_quote(worksheet)}")
+                if not df.empty:
+                    self._insert(worksheet, df)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def append(self, worksheet, rows):
+        """Insert ``rows`` after the existing ones; returns the position of the first."""
+        if rows.empty:
+            return None
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._ensure_table(worksheet, [str(c) for c in rows.columns])
+                at = self._db.execute(f"SELECT COUNT(*) FROM {_quote(worksheet)}").fetchone()[0]
+                self._insert(worksheet, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return at
+
+
+class _Entry:
+    __slots__ = ("frame", "version", "etag", "fetched_at", "epoch", "revision")
+
+    def __init__(self, frame, version, etag, fetched_at, epoch, revision=None):
+        self.frame = frame
+        self.version = version
+        self.etag = etag
+        self.fetched_at = fetched_at
+        self.epoch = epoch
+        self.revision = revision
+
+
+class WorksheetCache:
+    """Process-wide, bounded cache of worksheet DataFrames keyed by worksheet name.
+
+    Entries are served from memory until the portal writes to the worksheet
+    (``invalidate``) or they are older than ``max_staleness`` seconds, which bounds
+    how long edits made directly in the Google Sheet stay invisible. Every worksheet
+    carries a monotonically increasing ``version`` that only changes when its
+    content does, so derived results can be memoized on it, and an ``epoch`` that
+    only changes when it is rewritten rather than appended to, so a consumer that
+    remembers how many rows it has seen can tell whether the rest are new.
+    """
+
+    def __init__(self, max_entries=16, max_staleness=300.0):
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._generations = {}
+        self._epochs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, fetch):
+        """Return the cached frame for ``name``, calling ``fetch(name)`` on a miss."""
+        return self.snapshot(name, fetch)[0]
+
+    def snapshot(self, name, fetch):
+        """``(frame, epoch)`` of ``name``, fetching it on a miss like ``get``."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and now - entry.fetched_at <= self.max_staleness:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry.frame.copy(deep=False), entry.epoch
+            self.misses += 1
+        return self.refresh(name, fetch)
+
+    def refresh(self, name, fetch):
+        """Fetch ``name`` now and cache it, whether or not the cached copy is fresh;
+        returns ``(frame, epoch)`` like ``snapshot``."""
+        with self._lock:
+            generation = self._generations.get(name, 0)
+        df = fetch(name)
+        etag = frame_etag(df)
+        with self._lock:
+            # A write landed while we were fetching: hand the result to this caller
+            # but don't cache it, the next read must see the write.
+            if self._generations.get(name, 0) != generation:
+                return df.copy(deep=False), None
+            prev = self._entries.get(name)
+            if prev is None or etag is None or prev.etag != etag:
+                self._versions[name] = self._versions.get(name, 0) + 1
+            # Rows only appended since the previous fetch keep the epoch
+            grown = (prev is not None and etag is not None and len(df) >= len(prev.frame)
+                     and (prev.etag == etag or frame_etag(df.iloc[:len(prev.frame)]) == prev.etag))
+            if not grown:
+                self._epochs[name] = self._epochs.get(name, 0) + 1
+            self._put(name, _Entry(df, self._versions[name], etag, time.monotonic(), self._epochs[name]))
+        return df.copy(deep=False), self._epochs[name]
+
+    def _put(self, name, entry):
+        self._entries[name] = entry
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def prime(self, name, df):
+        """Seed the cache with ``df`` (e.g. a saved copy at startup) unless ``name``
+        is already cached; it is served like a fresh entry until ``refresh``."""
+        with self._lock:
+            if name in self._entries:
+                return False
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._epochs[name] = self._epochs.get(name, 0) + 1
+            self._put(name, _Entry(df, self._versions[name], frame_etag(df), time.monotonic(), self._epochs[name]))
+            return True
+
+    def peek(self, name):
+        """``(frame, epoch)`` of the cached entry however old, or ``(None, None)``."""
+        with self._lock:
+            entry = self._entries.get(name)
+            return (entry.frame.copy(deep=False), entry.epoch) if entry is not None else (None, None)
+
+    def invalidate(self, name):
+        """Drop ``name`` from the cache after the portal has written to it."""
+        with self._lock:
+            self._entries.pop(name, None)
+            self._generations[name] = self._generations.get(name, 0) + 1
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def extend(self, name, rows, normalise=None, expect=None):
+        """Write-through for appends: add ``rows`` to the cached frame, if any,
+        so the next read doesn't have to download the worksheet again.
+        ``normalise`` re-types the combined frame the way reads are typed. With
+        ``expect=(epoch, rows)`` the rows are only added if the entry still has
+        that epoch and length; returns whether they were."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if expect is not None and (entry is None or (entry.epoch, len(entry.frame)) != tuple(expect)):
+                return False
+            self._generations[name] = self._generations.get(name, 0) + 1
+            self._versions[name] = self._versions.get(name, 0) + 1
+            if entry is None:
+                return False
+            frame = pd.concat([entry.frame, rows], ignore_index=True) if not entry.frame.empty else rows.reset_index(drop=True)
+            if normalise is not None:
+                frame = normalise(frame)
+            self._entries[name] = _Entry(frame, self._versions[name], frame_etag(frame), entry.fetched_at, entry.epoch)
+            return True
+
+    def version(self, name):
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._entries):
+                self._generations[name] = self._generations.get(name, 0) + 1
+                self._versions[name] = self._versions.get(name, 0) + 1
+            self._entries.clear()
+
+
+class SharedWorksheetCache(WorksheetCache):
+    """WorksheetCache backed by a ``SnapshotStore`` shared with the other server
+    processes on the host.
+
+    A miss loads the latest shared snapshot when it is younger than
+    ``max_staleness``; otherwise one process refreshes the worksheet from the
+    backend and publishes it while the others wait for that snapshot. Writes are
+    published too (``extend``) or drop the snapshot (``invalidate``), so every
+    process sees them, and ``version`` is the shared version of the worksheet.
+    """
+
+    def __init__(self, shared, max_entries=16, max_staleness=300.0):
+        super().__init__(max_entries=max_entries, max_staleness=max_staleness)
+        self.shared = shared
+        self.shared_hits = 0
+
+    def _install(self, name, frame, rec):
+        with self._lock:
+            self._put(name, _Entry(frame, rec.version, rec.etag, rec.fetched_at, rec.epoch, rec.revision))
+
+    def _load_shared(self, name, rec):
+        df = self.shared.read(rec)
+        if df is None:
+            return None
+        self._install(name, df, rec)
+        with self._lock:
+            self.hits += 1
+            self.shared_hits += 1
+        return df.copy(deep=False), rec.epoch
+
+    def _fresh(self, rec):
+        return rec is not None and rec.file is not None and time.time() - rec.fetched_at <= self.max_staleness
+
+    def snapshot(self, name, fetch):
+        rec = self.shared.record(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if self._fresh(rec) and entry is not None and entry.revision == rec.revision:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry.frame.copy(deep=False), entry.epoch
+        if self._fresh(rec):
+            hit = self._load_shared(name, rec)
+            if hit is not None:
+                return hit
+
+        with self._lock:
+            self.misses += 1
+        return self._refresh(name, fetch, rec, wait=True)
+
+    def refresh(self, name, fetch):
+        return self._refresh(name, fetch, self.shared.record(name))
+
+    def _refresh(self, name, fetch, rec, wait=False):
+        revision = rec.revision if rec is not None else 0
+        leased = self.shared.lease(name)
+        if not leased and wait:
+            # Another process is refreshing it: take its snapshot, or fetch after all
+            # if it gives up
+            latest = self.shared.wait(name, revision)
+            if latest is not None and latest.revision != revision and self._fresh(latest):
+                hit = self._load_shared(name, latest)
+                if hit is not None:
+                    return hit
+        try:
+            fetched_at = time.time()
+            df = fetch(name)
+            etag = frame_etag(df)
+            grown = (rec is not None and rec.file is not None and etag is not None and len(df) >= rec.rows
+                     and (rec.etag == etag or frame_etag(df.iloc[:rec.rows]) == rec.etag))
+            epoch = rec.epoch if grown else (rec.epoch if rec is not None else 0) + 1
+            published = self.shared.publish(name, df, etag, epoch, fetched_at, expect=revision)
+        finally:
+            if leased:
+                self.shared.release(name)
+        # Someone wrote while we were fetching: like a local write, don't cache
+        if published is None:
+            return df.copy(deep=False), None
+        self._install(name, df, published)
+        return df.copy(deep=False), published.epoch
+
+    def prime(self, name, df):
+        """No-op: the shared snapshots already outlive restarts."""
+        return False
+
+    def peek(self, name):
+        """Like ``WorksheetCache.peek``, but only while our copy is the shared one."""
+        rec = self.shared.record(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or rec is None or entry.revision != rec.revision:
+                return None, None
+            return entry.frame.copy(deep=False), entry.epoch
+
+    def invalidate(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+        self.shared.invalidate(name)
+
+    def extend(self, name, rows, normalise=None, expect=None):
+        with self._lock:
+            entry = self._entries.get(name)
+            if expect is not None and (entry is None or (entry.epoch, len(entry.frame)) != tuple(expect)):
+                return False
+            self._entries.pop(name, None)
+        if entry is None:
+            self.shared.invalidate(name)
+            return False
+        frame = pd.concat([entry.frame, rows], ignore_index=True) if not entry.frame.empty else rows.reset_index(drop=True)
+        if normalise is not None:
+            frame = normalise(frame)
+        rec = self.shared.publish(name, frame, frame_etag(frame), entry.epoch, entry.fetched_at, expect=entry.revision)
+        if rec is None:
+            # Another process changed it since our copy. Rows pulled from the backend
+            # reach the others by their own pulls; our own write must make them re-read.
+            if expect is None:
+                self.shared.invalidate(name)
+            return False
+        self._install(name, frame, rec)
+        return True
+
+    def version(self, name):
+        return self.shared.version(name)
+
+    def clear(self):
+        """Forget this process's copies; the shared snapshots stay."""
+        with self._lock:
+            self._entries.clear()
+
+
+class ColumnIndex:
+    """Hash index from the values of one worksheet column to its row positions,
+    for O(1) exact-match lookups. Built once per worksheet version by
+    ``Storage.index``; blank and missing values are not indexed."""
+
+    def __init__(self, frame, column):
+        self.frame = frame
+        self.column = column
+        if frame.empty or column not in frame.columns:
+            self.positions = {}
+        else:
+            values = frame[column]
+            blank = values.isna() | (values.astype(str).str.strip() == "")
+            self.positions = group_positions(values.mask(blank).to_numpy(dtype=object))
+        self._sorted = None
+
+    def __contains__(self, value):
+        return value in self.positions
+
+    def rows(self, value):
+        pos = self.positions.get(value)
+        return self.frame.iloc[pos] if pos is not None else self.frame.iloc[0:0]
+
+    def first(self, value, column, default=None):
+        """``column`` of the first row whose indexed column equals ``value``."""
+        pos = self.positions.get(value)
+        if pos is None or column not in self.frame.columns:
+            return default
+        return self.frame[column].iat[pos[0]]
+
+    def keys(self):
+        """Distinct indexed values, sorted."""
+        if self._sorted is None:
+            self._sorted = sorted(self.positions)
+        return self._sorted
+
+
+def _match(df, where):
+    if df.empty or any(col not in df.columns for col in where):
+        return df.iloc[0:0]
+    mask = np.ones(len(df), dtype=bool)
+    for col, value in where.items():
+        mask &= (df[col] == value).to_numpy()
+    return df[mask]
+
+
+class StaleWorksheetError(RuntimeError):
+    """A write to a worksheet that is currently only known from its local copy;
+    checks made before the write (e.g. duplicate IDs) may have missed rows."""
+
+
+class Storage:
+    """Cached access to the worksheets of whichever backend is configured.
+
+    ``normalise`` is applied to every frame the backend returns (e.g. cleaning
+    student IDs) before it is cached or handed out. With write-behind enabled,
+    rows still waiting in the queue are overlaid on every read so a submission
+    is visible immediately. Every backend call is timed into ``metrics``.
+
+    ``changes`` is a feed of the rows appended to a worksheet since a cursor;
+    rows other processes appended are picked up by reading just the tail of the
+    worksheet, at most once per ``pull_interval`` seconds.
+
+    With a mirror enabled, reads fall back to the local copy of a worksheet when
+    the backend fails (retrying it after ``offline_retry`` seconds) and ``stale``
+    reports which worksheets are being served that way. Appends and replaces of
+    such a worksheet re-read it first and raise StaleWorksheetError rather than
+    go ahead if that fails; queued writes still queue.
+    """
+
+    def __init__(self, backend, cache, normalise=None, metrics=None, pull_interval=10.0, offline_retry=30.0):
+        self.backend = backend
+        self.cache = cache
+        self.normalise = normalise or (lambda df: df)
+        self.metrics = metrics or Metrics()
+        self.pull_interval = pull_interval
+        self.offline_retry = offline_retry
+        self.queue = None
+        self.mirror = None
+        self._mirrored = []
+        self._saved = {}
+        self._stale = {}
+        self._offline_until = {}
+        self._index_lock = threading.Lock()
+        self._indexes = {}
+        # Held while rows are added to the cached frame (never across backend calls)
+        self._write_lock = threading.Lock()
+        self._pull_lock = threading.Lock()
+        self._pulled = {}
+
+    def enable_write_behind(self, path, **options):
+        self.queue = WriteBehindQueue(path, flush=self._append, on_flushed=self._extend, **options).start()
+        return self.queue
+
+    def enable_mirror(self, directory, worksheets, interval=60.0):
+        """Keep a local copy of ``worksheets`` in ``directory``: seed the cache with
+        the saved copies now, then on a background thread re-read them from the
+        backend and save whatever the cache holds every ``interval`` seconds."""
+        self.mirror = SnapshotMirror(directory, interval=interval)
+        self._mirrored = list(worksheets)
+        for worksheet in self._mirrored:
+            df, synced_at = self.mirror.load(worksheet)
+            if df is not None and self.cache.prime(worksheet, df):
+                self._stale[worksheet] = synced_at
+        self.mirror.start(self._sync_mirror)
+        return self.mirror
+
+    def _sync_mirror(self):
+        for worksheet in self._mirrored:
+            if worksheet in self._stale or self.mirror.synced_at(worksheet) is None:
+                try:
+                    self.refresh(worksheet)
+                except Exception:
+                    continue
+            frame, _ = self.cache.peek(worksheet)
+            version = self.cache.version(worksheet)
+            if frame is not None and worksheet not in self._stale and self._saved.get(worksheet) != version:
+                self.mirror.save(worksheet, frame)
+                self._saved[worksheet] = version
+
+    def stale(self):
+        """``{worksheet: saved at}`` for the worksheets served from the local copy."""
+        return dict(self._stale)
+
+    def unreachable(self):
+        """Worksheets whose last read from the backend failed."""
+        return set(self._offline_until)
+
+    def _call(self, op, worksheet, call, sent=None):
+        """Run one backend call, recording its duration and the rows/bytes sent
+        (``sent``) or, for reads, returned."""
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self.metrics.record("sheet", op, time.perf_counter() - start, worksheet, ok=False)
+            raise
+        elapsed = time.perf_counter() - start
+        frame = sent if sent is not None else result
+        if frame is None:
+            self.metrics.record("sheet", op, elapsed, worksheet)
+        else:
+            self.metrics.record("sheet", op, elapsed, worksheet, len(frame), frame_bytes(frame))
+        return result
+
+    def _extend(self, worksheet, rows, at):
+        """Add rows this process appended at position ``at`` to the cached frame,
+        if they landed right after it; otherwise other writers' rows came in
+        between (or the position is unknown), so drop the entry instead."""
+        if rows.empty:
+            return
+        with self._write_lock:
+            frame, epoch = self.cache.peek(worksheet)
+            if frame is not None and at is not None and len(frame) >= at + len(rows):
+                # A tail read got to them first
+                return
+            if frame is None or at is None or not self.cache.extend(worksheet, rows, normalise=self.normalise,
+                                                                     expect=(epoch, at)):
+                self.cache.invalidate(worksheet)
+
+    def _append(self, worksheet, rows):
+        return self._call("append", worksheet, lambda: self.backend.append(worksheet, rows), sent=rows)
+
+    def _fetch(self, worksheet):
+        if self.mirror is not None and time.monotonic() < self._offline_until.get(worksheet, 0):
+            raise ConnectionError(f"{worksheet}: backend unavailable, serving the local copy")
+        try:
+            df = self.normalise(self._call("read", worksheet, lambda: self.backend.read(worksheet)))
+        except Exception:
+            if self.mirror is not None:
+                self._offline_until[worksheet] = time.monotonic() + self.offline_retry
+            raise
+        self._offline_until.pop(worksheet, None)
+        self._stale.pop(worksheet, None)
+        return df
+
+    def _local_copy(self, worksheet, exc):
+        """The mirrored copy of ``worksheet`` after a failed read, or ``exc`` re-raised."""
+        df, synced_at = self.mirror.load(worksheet) if self.mirror is not None else (None, None)
+        if df is None:
+            raise exc
+        self._stale[worksheet] = synced_at
+        return df
+
+    def ensure_writable(self, worksheet):
+        """Re-read ``worksheet`` if it is only known from its local copy, raising
+        StaleWorksheetError if the backend still can't be reached. Returns whether
+        it was re-read, i.e. checks made against the copy should be redone; call
+        it before such checks (``append`` and ``replace`` call it too)."""
+        if worksheet not in self._stale:
+            return False
+        try:
+            self.refresh(worksheet)
+        except Exception as exc:
+            raise StaleWorksheetError(f"{worksheet} is only available from its local copy; not written") from exc
+        return True
+
+    def refresh(self, worksheet):
+        """Re-read ``worksheet`` from the backend now, replacing the cached copy."""
+        self.cache.refresh(worksheet, self._fetch)
+
+    def _pending(self, worksheet):
+        if self.queue is None or not self.queue.pending_count(worksheet):
+            return None
+        return self.queue.pending(worksheet)
+
+    def load(self, worksheet):
+        try:
+            df = self.cache.get(worksheet, self._fetch)
+        except Exception as exc:
+            df = self._local_copy(worksheet, exc)
+        pending = self._pending(worksheet)
+        if pending is not None:
+            df = pd.concat([df, pending], ignore_index=True) if not df.empty else pending
+        return df
+
+    def index(self, worksheet, column, build=ColumnIndex):
+        """``build(frame, column)`` over the worksheet (a ColumnIndex by default),
+        rebuilt only when the worksheet version changes."""
+        version = self.version(worksheet)
+        key = (worksheet, column, build)
+        with self._index_lock:
+            hit = self._indexes.get(key)
+            if hit is not None and hit[0] == version:
+                return hit[1]
+        idx = build(self.load(worksheet), column)
+        with self._index_lock:
+            self._indexes[key] = (version, idx)
+        return idx
+
+    def find(self, worksheet, **where):
+        """Rows matching all ``column=value`` pairs; an indexed query when the
+        backend supports it, otherwise a hash-index lookup on the cached worksheet."""
+        if not hasattr(self.backend, "find"):
+            (column, value), *rest = where.items()
+            rows = self.index(worksheet, column).rows(value)
+            return _match(rows, dict(rest)) if rest else rows
+        try:
+            df = self.normalise(self._call("find", worksheet, lambda: self.backend.find(worksheet, **where)))
+        except Exception as exc:
+            df = _match(self._local_copy(worksheet, exc), where)
+        pending = self._pending(worksheet)
+        if pending is not None:
+            pending = _match(pending, where)
+            if not pending.empty:
+                df = pd.concat([df, pending], ignore_index=True) if not df.empty else pending
+        return df
+
+    def append(self, worksheet, rows):
+        self.ensure_writable(worksheet)
+        try:
+            at = self._append(worksheet, rows)
+        except Exception:
+            self.cache.invalidate(worksheet)
+            raise
+        self._extend(worksheet, rows, at)
+
+    def enqueue(self, worksheet, rows):
+        """Queue ``rows`` for a background append; appends synchronously when
+        write-behind is disabled."""
+        if self.queue is None:
+            return self.append(worksheet, rows)
+        self.queue.enqueue(worksheet, rows)
+
+    def replace(self, worksheet, df):
+        self.ensure_writable(worksheet)
+        try:
+            self._call("replace", worksheet, lambda: self.backend.replace(worksheet, df), sent=df)
+        finally:
+            self.cache.invalidate(worksheet)
+
+    def pull(self, worksheet):
+        """Add the rows appended to ``worksheet`` since it was cached (e.g. by
+        other processes) to the cached frame, reading only the rows after it.
+        Drops the entry instead, so the next read is a full one, when the backend
+        can't tell which rows are new. Does nothing if the worksheet isn't
+        cached or was pulled less than ``pull_interval`` seconds ago."""
+        if not hasattr(self.backend, "read_since"):
+            return
+        now = time.monotonic()
+        with self._pull_lock:
+            if now - self._pulled.get(worksheet, -self.pull_interval) < self.pull_interval:
+                return
+            self._pulled[worksheet] = now
+        frame, epoch = self.cache.peek(worksheet)
+        if frame is None:
+            return
+        columns = list(frame.columns)
+        try:
+            rows = self._call("read_since", worksheet, lambda: self.backend.read_since(worksheet, len(frame), columns))
+        except Exception:
+            # Best effort: a full read will be tried when the entry expires
+            return
+        with self._write_lock:
+            if rows is None:
+                self.cache.invalidate(worksheet)
+            elif not rows.empty:
+                # Dropped if the entry changed meanwhile (e.g. an own append); the next pull catches up
+                self.cache.extend(worksheet, self.normalise(rows), normalise=self.normalise,
+                                  expect=(epoch, len(frame)))
+
+    def changes(self, worksheet, cursor=None):
+        """Rows appended to ``worksheet`` since ``cursor``, as ``(rows, cursor,
+        reset)``: pass the returned cursor to the next call. With no cursor, or
+        when the worksheet has been rewritten since (``reset`` is True), ``rows``
+        is the whole worksheet. Rows still in the write-behind queue are not
+        included until they are flushed; see ``pending``."""
+        self.pull(worksheet)
+        try:
+            frame, epoch = self.cache.snapshot(worksheet, self._fetch)
+        except Exception as exc:
+            frame, epoch = self._local_copy(worksheet, exc), None
+        if epoch is None or cursor is None or cursor[0] != epoch or cursor[1] > len(frame):
+            return frame, (epoch, len(frame)), True
+        return frame.iloc[cursor[1]:], (epoch, len(frame)), False
+
+    def pending(self, worksheet):
+        """Rows of ``worksheet`` still waiting in the write-behind queue, or None."""
+        return self._pending(worksheet)
+
+    def version(self, worksheet):
+        """Changes whenever the rows ``load(worksheet)`` returns may have changed."""
+        return (self.cache.version(worksheet), self.queue.seq(worksheet) if self.queue is not None else 0)
+
+    def pending_count(self, worksheet=None):
+        return self.queue.pending_count(worksheet) if self.queue is not None else 0
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from auth import CredentialIndex, LoginThrottle
+
+
+def test_padded_username_verifies():
+    index = CredentialIndex(pd.DataFrame({"full_name": ["Dr X"], "username": ["drx"], "password": ["h"],
+                                          "email": ["x@unam"]}))
+    assert index.verify(" drx ", "h")["username"] == "drx"
+    assert index.verify("drx", "wrong") is None
+
+
+def test_whitespace_variants_share_the_lockout():
+    throttle = LoginThrottle(max_attempts=3)
+    for username in ("drx", " drx", "drx  "):
+        assert throttle.retry_after(username) == 0
+        throttle.failure(username)
+    assert throttle.retry_after("\tdrx ") > 0
+    assert throttle.retry_after("drx") > 0
+    throttle.success(" drx")
+    assert throttle.retry_after("drx") == 0
@@ -0,0 +1,105 @@
+import pandas as pd
+
+from bulk_import import validate_marks, validate_registrations
+
+REGISTRY = pd.DataFrame({"student_id": ["2101", "2102"], "student_name": ["A", "B"]})
+
+
+def marks(*rows):
+    """An uploaded mark sheet (all strings, "" for blanks) with the given rows."""
+    columns = ["student_id", "assessment_type", "raw_mark", "crit_1", "crit_2", "crit_3", "crit_4", "crit_5",
+               "examiner", "remarks"]
+    return pd.DataFrame([{**dict.fromkeys(columns, ""), "examiner": "Dr X", **r} for r in rows], columns=columns)
+
+
+def errors_of(errors, row):
+    return set(zip(errors.loc[errors["row"] == row, "column"], errors.loc[errors["row"] == row, "error"]))
+
+
+def test_marks_from_a_complete_rubric_are_summed():
+    accepted, errors = validate_marks(marks({"student_id": "2101", "assessment_type": "Presentation 2",
+                                             "crit_1": "7", "crit_2": "8.5"}), "Research Project", REGISTRY)
+    assert errors.empty
+    assert accepted["raw_mark"].tolist() == [15.5]
+    assert accepted["assessment_type"].tolist() == ["Presentation 2 (10%)"]
+
+
+def test_blank_raw_mark_needs_every_criterion():
+    accepted, errors = validate_marks(marks(
+        {"student_id": "2101", "assessment_type": "Presentation 2"},
+        {"student_id": "2102", "assessment_type": "Presentation 3", "crit_1": "6"},
+    ), "Research Project", REGISTRY)
+    assert accepted.empty
+    assert errors_of(errors, 2) == {("crit_1", "Some criteria not scored"), ("crit_2", "Some criteria not scored")}
+    assert errors_of(errors, 3) == {("crit_2", "Some criteria not scored"), ("crit_3", "Some criteria not scored")}
+
+
+def test_a_raw_mark_needs_no_criteria():
+    accepted, errors = validate_marks(marks({"student_id": "2101", "assessment_type": "Presentation 3",
+                                             "raw_mark": "21", "crit_1": "6"}), "Research Project", REGISTRY)
+    assert errors.empty and accepted["raw_mark"].tolist() == [21.0]
+
+
+def test_report_without_a_raw_mark_is_rejected():
+    accepted, errors = validate_marks(marks({"student_id": "2101", "assessment_type": "Final Report"}),
+                                      "Research Project", REGISTRY)
+    assert accepted.empty
+    assert errors_of(errors, 2) == {("raw_mark", "Required (this stage has no criteria)")}
+
+
+def test_mark_rows_are_checked_against_the_registry_and_rubric():
+    accepted, errors = validate_marks(marks(
+        {"student_id": "9999", "assessment_type": "Final Report", "raw_mark": "70"},
+        {"student_id": "2101", "assessment_type": "Presentation 9", "raw_mark": "5"},
+        {"student_id": "2101", "assessment_type": "Presentation 2", "crit_1": "11", "crit_2": "x"},
+        {"student_id": "2101", "assessment_type": "Presentation 2", "crit_1": "5", "crit_2": "5", "crit_3": "5"},
+        {"student_id": "2102", "assessment_type": "Final Report", "raw_mark": "101"},
+    ), "Research Project", REGISTRY)
+    assert accepted.empty
+    assert errors_of(errors, 2) == {("student_id", "Not registered")}
+    assert errors_of(errors, 3) == {("assessment_type", "Unknown assessment stage")}
+    assert errors_of(errors, 4) == {("crit_1", "Must be 0-10 in steps of 0.5"), ("crit_2", "Not a number")}
+    assert errors_of(errors, 5) == {("crit_3", "Not part of this stage's rubric")}
+    assert errors_of(errors, 6) == {("raw_mark", "Out of range (0-100)")}
+
+
+def test_missing_mark_columns_are_reported_on_the_header_row():
+    accepted, errors = validate_marks(pd.DataFrame({"student_id": ["2101"]}), "Research Project", REGISTRY)
+    assert accepted.empty
+    assert errors.to_dict("records") == [{"row": 1, "column": "assessment_type, examiner",
+                                          "error": "Missing column(s) in the header row"}]
+
+
+def registration(**values):
+    row = {"student_id": "2201", "student_name": "C", "email": "c@x", "supervisor": "S",
+           "research_title": "T", "abstract": "Short abstract"}
+    return {**row, **values}
+
+
+def test_registrations_are_checked_like_the_form():
+    upload = pd.DataFrame([
+        registration(),
+        registration(student_id="2202", email=""),
+        registration(student_id="2203", abstract="word " * 251),
+        registration(student_id="2101"),
+        registration(student_id="2204.0"),
+        registration(student_id="2204"),
+    ])
+    accepted, errors = validate_registrations(upload, "Research Project", REGISTRY)
+    assert accepted["student_id"].tolist() == ["2201"]
+    assert errors_of(errors, 3) == {("email", "Required")}
+    assert errors_of(errors, 4) == {("abstract", "Abstract too long (251 words)")}
+    assert errors_of(errors, 5) == {("student_id", "Student ID already registered")}
+    assert errors_of(errors, 6) == errors_of(errors, 7) == {("student_id", "Duplicate student ID in the file")}
+
+
+def test_design_groups_need_two_members():
+    member = {"supervisor": "S", "abstract": "A"}
+    upload = pd.DataFrame([
+        {"group_name": "G1", "student_name": "C", "student_id": "3001", **member},
+        {"group_name": "G1", "student_name": "D", "student_id": "3002", **member},
+        {"group_name": "G2", "student_name": "E", "student_id": "3003", **member},
+    ])
+    accepted, errors = validate_registrations(upload, "Design Project", pd.DataFrame(columns=["group_name", "student_id"]))
+    assert accepted["student_id"].tolist() == ["3001", "3002"]
+    assert errors_of(errors, 4) == {("group_name", "Groups need at least 2 members")}
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from search import ResourceIndex, SuggestionIndex
+
+
+def test_rows_without_any_words_build_an_empty_index():
+    index = ResourceIndex(pd.DataFrame({"resource_name": ["", None, "--"], "stream": ["Research Project"] * 3}),
+                          "stream")
+    assert index.postings == {} and len(index.vocabulary) == 0
+    assert index.search("", "Research Project").tolist() == [0, 1, 2]
+    assert index.search("template", "Research Project").tolist() == []
+
+
+def test_every_query_word_must_start_a_word():
+    index = SuggestionIndex(pd.DataFrame({
+        "type": ["Research Project", "Research Project", "Design Project"],
+        "title": ["Solar cells", "Wind farms", "Solar car"],
+        "abstract": ["PV study", "Turbine siting", ""],
+        "supervisor": ["Dr X", "Dr Y", "Dr X"],
+    }), "type")
+    assert index.search("sol", "Research Project").tolist() == [0]
+    assert index.search("solar study", "Research Project").tolist() == [0]
+    assert index.search("olar", "Research Project").tolist() == []
+    assert index.search("", "Research Project", supervisor="Dr Y").tolist() == [1]
+    assert index.supervisor_names("Design Project") == ["Dr X"]
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from benchmarks import fake_sheets
+from storage import GSheetsBackend, Storage, WorksheetCache
+
+
+@pytest.fixture
+def conn():
+    fake_sheets.reset({"marks": pd.DataFrame({"student_id": ["1", "2"]})})
+    return fake_sheets.FakeSheetsConnection("test")
+
+
+def replica(conn):
+    return Storage(GSheetsBackend(conn), WorksheetCache(), pull_interval=0)
+
+
+def row(value):
+    return pd.DataFrame({"student_id": [value]})
+
+
+def test_append_between_another_writers_rows_is_not_misplaced(conn):
+    a, b = replica(conn), replica(conn)
+    a.load("marks")
+    b.load("marks")
+    b.append("marks", row("3"))
+    a.append("marks", row("4"))
+    rows, _, _ = a.changes("marks")
+    assert rows["student_id"].tolist() == ["1", "2", "3", "4"]
+    rows, _, _ = b.changes("marks")
+    assert rows["student_id"].tolist() == ["1", "2", "3", "4"]
+
+
+def test_own_append_extends_the_cache_without_a_read(conn):
+    a = replica(conn)
+    a.load("marks")
+    before = fake_sheets.counts()["reads"]
+    a.append("marks", row("3"))
+    assert a.load("marks")["student_id"].tolist() == ["1", "2", "3"]
+    assert fake_sheets.counts()["reads"] == before
+
+
+def test_tail_reads_match_full_reads(conn):
+    fake_sheets.reset({"marks": pd.DataFrame({"student_id": ["1", None, "2"],
+                                              "timestamp": ["2026-10-01 09:00", None, "2026-10-01 10:00"]})})
+    a, b = replica(conn), replica(conn)
+    assert a.load("marks")["student_id"].tolist() == ["1", "2"]
+    b.append("marks", pd.DataFrame({"student_id": ["3"], "timestamp": ["2026-10-02 11:30"]}))
+    rows, _, _ = a.changes("marks")
+    assert rows["student_id"].tolist() == ["1", "2", "3"]
+    assert rows["timestamp"].iloc[-1] == "2026-10-02 11:30"
+    # Lands after the blank row too, so it still extends the cache
+    a.append("marks", pd.DataFrame({"student_id": ["4"], "timestamp": ["2026-10-02 12:00"]}))
+    before = fake_sheets.counts()["reads"]
+    assert a.load("marks")["student_id"].tolist() == ["1", "2", "3", "4"]
+    assert fake_sheets.counts()["reads"] == before
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from write_queue import WriteBehindQueue
+
+
+def recorder():
+    sent = []
+    return sent, lambda worksheet, rows: sent.extend(rows["student_id"])
+
+
+def row(value):
+    return pd.DataFrame({"student_id": [value]})
+
+
+def test_processes_sharing_a_queue_file_flush_only_their_own_rows(tmp_path):
+    path = str(tmp_path / "queue.db")
+    sent_a, flush_a = recorder()
+    sent_b, flush_b = recorder()
+    a = WriteBehindQueue(path, flush_a)
+    a.enqueue("marks", row("1"))
+    b = WriteBehindQueue(path, flush_b)
+    a.enqueue("marks", row("2"))
+    assert b.flush_once() and sent_b == []
+    assert a.flush_once() and sent_a == ["1", "2"]
+    assert a.pending_count() == b.pending_count() == 0
+
+
+def test_rows_of_an_expired_owner_are_taken_over(tmp_path):
+    path = str(tmp_path / "queue.db")
+    sent_a, flush_a = recorder()
+    sent_b, flush_b = recorder()
+    a = WriteBehindQueue(path, flush_a, lease_seconds=-1)
+    a.enqueue("marks", row("1"))
+    b = WriteBehindQueue(path, flush_b)
+    assert b.pending_count("marks") == 1
+    b.enqueue("marks", row("2"))
+    assert b.flush_once() and sent_b == ["1", "2"]
+    # The old owner's delete can't remove rows it no longer owns, and it sees they're gone
+    a.claim()
+    assert a.pending_count() == 0
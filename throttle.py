@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+
+from write_queue import is_quota_error
+
+# Backend calls that only read, so identical concurrent ones can share a request
+READS = ("read", "read_since", "find")
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average and bursts of up to ``burst``.
+
+    ``acquire`` reserves a token and returns how long the caller has to wait for
+    it, so callers are served in arrival order; ``penalise`` holds everyone back
+    for a while, e.g. after the API reported its quota exhausted.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _fill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self):
+        with self._lock:
+            self._fill(time.monotonic())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def penalise(self, seconds):
+        with self._lock:
+            self._fill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.results = []
+        self.error = None
+
+
+def _own(result):
+    """A shallow copy of a frame result, so each caller can change its columns."""
+    return result.copy(deep=False) if hasattr(result, "copy") else result
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+class ThrottledBackend:
+    """Wraps a storage backend to stay within the API quota under load spikes.
+
+    Identical reads issued while one is already in flight (e.g. a whole cohort
+    opening their scores at once) wait for it and share its result instead of
+    sending their own. Every call that does reach the backend first takes a
+    token from a bucket of ``rate`` calls per second (bursts of ``burst``), and
+    quota errors (HTTP 429) are retried up to ``max_retries`` times with
+    exponential backoff and jitter, during which the bucket is held back for
+    everyone. ``stats`` reports how many callers are waiting and how often
+    calls were coalesced, throttled or rejected by the quota.
+    """
+
+    def __init__(self, backend, rate=1.0, burst=10, max_retries=5, backoff=1.0, max_backoff=32.0):
+        self.backend = backend
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.quota_errors = 0
+        self.retries = 0
+
+    def __getattr__(self, name):
+        # Only what the wrapped backend has, so e.g. ``hasattr(backend, "find")`` holds
+        attr = getattr(self.backend, name)
+        if not callable(attr):
+            return attr
+        if name in READS:
+            def read(*args, **kwargs):
+                return self._shared((name, _hashable(args), _hashable(kwargs)), lambda: attr(*args, **kwargs))
+            return read
+        def write(*args, **kwargs):
+            try:
+                return self._send(lambda: attr(*args, **kwargs))
+            finally:
+                # Reads already in flight may predate the write; later ones must not join them
+                self._detach(args[0] if args else kwargs.get("worksheet"))
+        return write
+
+    def _detach(self, worksheet):
+        with self._lock:
+            for key in [k for k in self._flights if k[1][:1] == (worksheet,) or dict(k[2]).get("worksheet") == worksheet]:
+                del self._flights[key]
+
+    def _shared(self, key, call):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+                self.waiting += 1
+        if not leader:
+            flight.done.wait()
+            with self._lock:
+                self.waiting -= 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.results.pop()
+        result = error = None
+        try:
+            result = self._send(call)
+        except BaseException as exc:
+            error = exc
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            # No one can join any more: hand every caller its own copy before anyone
+            # (the leader's caller included) starts changing it
+            flight.error = error
+            if error is None:
+                flight.results = [_own(result) for _ in range(flight.waiters)]
+        flight.done.set()
+        if error is not None:
+            raise error
+        return _own(result)
+
+    def _wait(self, seconds):
+        with self._lock:
+            self.waiting += 1
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def _send(self, call):
+        attempt = 0
+        while True:
+            delay = self.bucket.acquire()
+            if delay > 0:
+                with self._lock:
+                    self.throttled += 1
+                    self.throttled_seconds += delay
+                self._wait(delay)
+            with self._lock:
+                self.calls += 1
+                self.in_flight += 1
+            try:
+                return call()
+            except Exception as exc:
+                if not is_quota_error(exc):
+                    raise
+                with self._lock:
+                    self.quota_errors += 1
+                if attempt >= self.max_retries:
+                    raise
+                backoff = min(self.max_backoff, self.backoff * 2 ** attempt) * (0.5 + random.random() / 2)
+                self.bucket.penalise(backoff)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"waiting": self.waiting, "in_flight": self.in_flight, "calls": self.calls,
+                    "coalesced": self.coalesced, "throttled": self.throttled,
+                    "throttled_seconds": round(self.throttled_seconds, 3),
+                    "quota_errors": self.quota_errors, "retries": self.retries}
@@ -0,0 +1,195 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+def _json_cell(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def is_quota_error(exc):
+    """True for Sheets API rate-limit responses (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    text = str(exc)
+    return status == 429 or "429" in text or "RESOURCE_EXHAUSTED" in text or "Quota exceeded" in text
+
+
+class WriteBehindQueue:
+    """Durable write-behind queue for appended rows.
+
+    ``enqueue`` persists rows to a local SQLite file and returns immediately; a
+    background worker hands them to ``flush(worksheet, rows)`` in batches of up to
+    ``batch_size`` and removes them once that succeeds, then calls
+    ``on_flushed(worksheet, rows, result)`` with what ``flush`` returned. Failed
+    flushes are retried with exponential backoff and jitter (quota errors are
+    counted separately), so nothing is lost on errors or restarts. Delivery is
+    at-least-once: a crash between a successful flush and the local delete
+    re-sends that batch.
+
+    Several processes can share one queue file: each row belongs to the process
+    that queued it, which holds a lease on its rows for ``lease_seconds`` and
+    renews it while running. Only its own rows are flushed and deleted (by id);
+    rows whose owner's lease ran out, e.g. after a crash, are taken over by
+    another process (or the restarted one).
+    """
+
+    def __init__(self, path, flush, on_flushed=None, batch_size=200, interval=2.0, max_backoff=120.0,
+                 lease_seconds=300.0):
+        self.flush = flush
+        self.on_flushed = on_flushed
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self.last_error = None
+        self.quota_errors = 0
+        self.flushed_rows = 0
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "worksheet TEXT NOT NULL, row TEXT NOT NULL, enqueued_at REAL NOT NULL, owner TEXT)")
+        if "owner" not in [r[1] for r in self._db.execute("PRAGMA table_info(pending)")]:
+            self._db.execute("ALTER TABLE pending ADD COLUMN owner TEXT")
+        self._db.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, lease_until REAL NOT NULL)")
+        # In-memory mirror of this process's pending rows so reads can overlay them cheaply
+        self._pending = {}
+        self._seq = {}
+        self.claim()
+
+    def claim(self):
+        """Renew this process's lease and take over the rows of expired ones; the
+        in-memory rows are reloaded from the rows this process now owns."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT INTO owners (owner, lease_until) VALUES (?, ?) ON CONFLICT(owner) "
+                                 "DO UPDATE SET lease_until = excluded.lease_until", (self.owner, now + self.lease_seconds))
+                self._db.execute("DELETE FROM owners WHERE lease_until < ?", (now,))
+                self._db.execute("UPDATE pending SET owner = ? WHERE owner IS NULL OR owner NOT IN "
+                                 "(SELECT owner FROM owners)", (self.owner,))
+                rows = self._db.execute("SELECT id, worksheet, row FROM pending WHERE owner = ? ORDER BY id",
+                                        (self.owner,)).fetchall()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            pending = {}
+            for rid, worksheet, row in rows:
+                pending.setdefault(worksheet, []).append((rid, json.loads(row)))
+            for worksheet in set(pending) | set(self._pending):
+                if [rid for rid, _ in pending.get(worksheet, [])] != [rid for rid, _ in self._pending.get(worksheet, [])]:
+                    self._seq[worksheet] = self._seq.get(worksheet, 0) + 1
+            self._pending = pending
+
+    def enqueue(self, worksheet, rows):
+        records = [{str(k): _json_cell(v) for k, v in r.items()} for r in rows.to_dict("records")]
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                ids = []
+                for rec in records:
+                    cur = self._db.execute("INSERT INTO pending (worksheet, row, enqueued_at, owner) VALUES (?, ?, ?, ?)",
+                                           (worksheet, json.dumps(rec), now, self.owner))
+                    ids.append(cur.lastrowid)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._pending.setdefault(worksheet, []).extend(zip(ids, records))
+            self._seq[worksheet] = self._seq.get(worksheet, 0) + 1
+        self._wake.set()
+
+    def pending(self, worksheet):
+        """Rows of ``worksheet`` that have not been flushed yet, as a DataFrame."""
+        with self._lock:
+            rows = [rec for _, rec in self._pending.get(worksheet, [])]
+        return pd.DataFrame(rows)
+
+    def pending_count(self, worksheet=None):
+        with self._lock:
+            if worksheet is not None:
+                return len(self._pending.get(worksheet, []))
+            return sum(len(v) for v in self._pending.values())
+
+    def seq(self, worksheet):
+        """Counter that changes whenever the pending rows of ``worksheet`` do."""
+        with self._lock:
+            return self._seq.get(worksheet, 0)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            if self.pending_count():
+                self._wake.set()
+        return self
+
+    def _run(self):
+        while True:
+            # Wake up now and then to renew the lease and pick up orphaned rows
+            if self._wake.wait(self.lease_seconds / 5):
+                self._wake.clear()
+                # Give submissions arriving around the same time a chance to share the batch
+                time.sleep(self.interval)
+            while True:
+                try:
+                    self.claim()
+                except sqlite3.Error as exc:
+                    self.last_error = f"{type(exc).__name__}: {exc}"
+                if not self.pending_count():
+                    break
+                if self.flush_once():
+                    self._failures = 0
+                    continue
+                self._failures += 1
+                delay = min(self.max_backoff, self.interval * 2 ** self._failures)
+                time.sleep(delay * (0.5 + random.random() / 2))
+
+    def flush_once(self):
+        """Flush one batch per worksheet; returns False if any flush failed."""
+        ok = True
+        with self._lock:
+            worksheets = [w for w, rows in self._pending.items() if rows]
+        for worksheet in worksheets:
+            with self._lock:
+                batch = self._pending[worksheet][:self.batch_size]
+            frame = pd.DataFrame([rec for _, rec in batch])
+            try:
+                result = self.flush(worksheet, frame)
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                if is_quota_error(exc):
+                    self.quota_errors += 1
+                ok = False
+                continue
+            with self._lock:
+                # Exactly the rows flushed: other rows may have been queued or claimed meanwhile
+                done = [rid for rid, _ in batch]
+                self._db.execute(f"DELETE FROM pending WHERE owner = ? AND id IN ({', '.join('?' * len(done))})",
+                                 [self.owner] + done)
+                done = set(done)
+                self._pending[worksheet] = [r for r in self._pending[worksheet] if r[0] not in done]
+                self._seq[worksheet] = self._seq.get(worksheet, 0) + 1
+            self.flushed_rows += len(batch)
+            if self.on_flushed is not None:
+                self.on_flushed(worksheet, frame, result)
+        if ok:
+            self.last_error = None
+        return ok